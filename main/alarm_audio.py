@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+class AlarmAudio:
+    """
+    常驻报警音频服务
+    混音器只初始化一次, 报警声音只解码一次并缓存, 由单个播放线程从命令队列中取命令播放.
+    检测线程调用play()只是把命令放进队列, 不阻塞也不创建线程.
+    同一个声音在播放中或去重时间内重复报警时不会叠加播放.
+    driver='dummy'时使用SDL空音频驱动(无声卡/测试环境).
+    """
+    def __init__(self, sound_file: Optional[str], zone_sounds: Optional[Dict[str, str]] = None,
+                 dedupe_time: float = 2.0, driver: Optional[str] = None, max_pending: int = 8):
+        """
+        :param sound_file: 默认报警声音, 为None时只播放区域专属声音
+        :param zone_sounds: 区域专属声音 {区域名: 声音文件}
+        :param dedupe_time: 同一声音的最短重复间隔(秒)
+        :param driver: SDL音频驱动名, 例如'dummy', 为None时使用系统默认
+        :param max_pending: 命令队列长度, 队列满时丢弃新命令
+        """
+        self.sound_file = sound_file
+        self.zone_sounds = dict(zone_sounds or {})
+        self.dedupe_time = dedupe_time
+        self.driver = driver
+        self.enabled = True  # 界面上的声音开关
+        self._commands = queue.Queue(maxsize=max_pending)
+        self._last_request = {}  # 声音文件 -> 上次入队时间
+        self._thread = None
+
+        # 统计
+        self.requested = 0
+        self.played = 0
+        self.deduped = 0
+        self.dropped = 0
+
+    def start(self):
+        """启动播放线程(混音器在播放线程中初始化)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止播放线程并释放混音器"""
+        if self._thread is None:
+            return
+        while True:
+            try:
+                self._commands.put_nowait(None)
+                break
+            except queue.Full:
+                try:
+                    self._commands.get_nowait()
+                except queue.Empty:
+                    pass
+        self._thread.join(timeout=2)
+        self._thread = None
+
+    def sounds_for(self, zones: List[str]) -> List[str]:
+        """报警区域对应的声音文件, 没有区域专属声音时用默认声音"""
+        sounds = [self.zone_sounds[zone] for zone in zones if zone in self.zone_sounds]
+        if not sounds and self.sound_file:
+            sounds = [self.sound_file]
+        return list(dict.fromkeys(sounds))
+
+    def play(self, zones: Optional[List[str]] = None, trace: Optional[dict] = None):
+        """
+        请求播放报警声音(非阻塞)
+        :param zones: 触发报警的区域名, 用于选择区域专属声音
+        :param trace: 该帧的延迟追踪记录, 声音开始播放时写入'alarm_sound'时间戳
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        for sound in self.sounds_for(zones or []):
+            self.requested += 1
+            if now - self._last_request.get(sound, -self.dedupe_time) < self.dedupe_time:
+                self.deduped += 1
+                continue
+            try:
+                self._commands.put_nowait((sound, trace))
+                self._last_request[sound] = now
+            except queue.Full:
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            'requested': self.requested,
+            'played': self.played,
+            'deduped': self.deduped,
+            'dropped': self.dropped,
+        }
+
+    def _run(self):
+        """播放线程主函数"""
+        import pygame
+
+        if self.driver:
+            os.environ['SDL_AUDIODRIVER'] = self.driver
+        try:
+            pygame.mixer.init()
+        except Exception as e:
+            print(f"音频初始化失败, 报警声音不可用: {e}")
+            pygame = None
+
+        sounds = {}  # 声音文件 -> (pygame.mixer.Sound, 正在使用的通道)
+        while True:
+            command = self._commands.get()
+            if command is None:
+                break
+            sound_file, trace = command
+            if pygame is None:
+                continue
+            try:
+                if sound_file not in sounds:
+                    sounds[sound_file] = [pygame.mixer.Sound(sound_file), None]
+                entry = sounds[sound_file]
+                # 同一声音还在播放时不叠加
+                if entry[1] is not None and entry[1].get_busy():
+                    self.deduped += 1
+                    continue
+                entry[1] = entry[0].play()
+                self.played += 1
+                if trace is not None:
+                    trace.setdefault('alarm_sound', time.monotonic())
+            except Exception as e:
+                print(f"播放声音失败: {e}")
+
+        if pygame is not None:
+            pygame.mixer.quit()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+from ultralytics import YOLO
+
+# 推理后端 -> ultralytics导出格式
+BACKENDS = {
+    'torch': None,
+    'onnx': 'onnx',        # ONNX Runtime
+    'openvino': 'openvino',
+    'onnx_int8': 'onnx',   # quantize.py生成的INT8模型, 由ONNX Runtime加载
+}
+
+def weights_hash(model_path: str, chunk_size: int = 1 << 20) -> str:
+    """计算权重文件的sha256(取前16位), 作为导出缓存的键"""
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def export_path(model_path: str, backend: str, imgsz: int, dynamic: bool, cache_dir: str) -> str:
+    """
+    导出产物在缓存目录中的路径(按权重哈希/imgsz/是否动态shape区分)
+    :return: onnx为文件路径, openvino为目录路径
+    """
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    name = f"{stem}_{weights_hash(model_path)}_{imgsz}{'_dynamic' if dynamic else ''}"
+    if backend == 'openvino':
+        return os.path.join(cache_dir, f"{name}_openvino_model")
+    return os.path.join(cache_dir, f"{name}.{BACKENDS[backend]}")
+
+def int8_path(model_path: str, imgsz: int, dynamic: bool, cache_dir: str) -> str:
+    """INT8量化模型在缓存目录中的路径(由quantize.py生成)"""
+    return export_path(model_path, 'onnx', imgsz, dynamic, cache_dir)[:-len('.onnx')] + '_int8.onnx'
+
+def export_model(model_path: str, backend: str, imgsz: int = 640, dynamic: bool = False,
+                 cache_dir: str = os.path.join('save', 'export_cache')) -> str:
+    """
+    把.pt权重导出为指定后端格式, 已有缓存时直接复用
+    :param model_path: .pt权重路径
+    :param backend: 'onnx' / 'openvino'
+    :param imgsz: 推理输入尺寸(导出时固定)
+    :param dynamic: 是否导出动态shape(多路batch推理需要)
+    :param cache_dir: 导出缓存目录
+    :return: 导出产物路径
+    """
+    target = export_path(model_path, backend, imgsz, dynamic, cache_dir)
+    if os.path.exists(target):
+        return target
+    
+    print(f"首次使用{backend}后端, 正在导出模型: {model_path} -> {target}")
+    os.makedirs(cache_dir, exist_ok=True)
+    exported = YOLO(model_path).export(format=BACKENDS[backend], imgsz=imgsz, dynamic=dynamic)
+    # 先移到本进程独有的临时路径, 再原子替换到缓存路径, 读取方不会看到写了一半的产物
+    temp = f"{target}.{os.getpid()}.tmp"
+    shutil.move(str(exported), temp)
+    try:
+        os.replace(temp, target)
+    except OSError:
+        # openvino目录已被其他进程先放好时无法替换, 用已有的
+        if not os.path.exists(target):
+            raise
+        if os.path.isdir(temp):
+            shutil.rmtree(temp)
+        else:
+            os.remove(temp)
+    return target
+
+def prepare_model(model_path: str, backend: str, imgsz: int = 640, dynamic: bool = False,
+                  cache_dir: str = os.path.join('save', 'export_cache')):
+    """
+    预先导出模型(不加载), 在启动多个工作进程之前于主进程调用一次,
+    避免各进程同时冷启动导出、写同一个中间文件
+    """
+    if BACKENDS.get(backend) and backend != 'onnx_int8' and model_path.endswith('.pt'):
+        export_model(model_path, backend, imgsz, dynamic, cache_dir)
+
+def load_model(model_path: str, backend: str = 'torch', imgsz: int = 640, dynamic: bool = False,
+               cache_dir: str = os.path.join('save', 'export_cache')) -> YOLO:
+    """
+    按后端加载模型, 返回的对象与PyTorch版YOLO用法和结果格式一致
+    :param model_path: .pt权重路径, 或已导出的.onnx文件/openvino目录(直接加载)
+    :param backend: 'torch' / 'onnx' / 'openvino' / 'onnx_int8'
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {backend} (可选: {', '.join(BACKENDS)})")
+    if backend == 'torch' or not model_path.endswith('.pt'):
+        return YOLO(model_path, task='detect')
+    if backend == 'onnx_int8':
+        path = int8_path(model_path, imgsz, dynamic, cache_dir)
+        if not os.path.exists(path):
+            hint = ' --dynamic' if dynamic else ''
+            raise FileNotFoundError(f"未找到INT8模型: {path}, 请先运行 python quantize.py{hint} 生成")
+        return YOLO(path, task='detect')
+    return YOLO(export_model(model_path, backend, imgsz, dynamic, cache_dir), task='detect')
@@ -0,0 +1,258 @@
+"""
+录像离线批处理
+对录像文件(或目录下的所有录像)按与实时检测相同的掩码/推理/报警规则重新扫描,
+流式解码, 按batch推理, 多个文件分给多个工作进程并行处理.
+每个文件输出检测结果(JSON行, 只记录有检测目标的帧)和报警时间段, 运行时显示进度和吞吐.
+
+用法:
+    python batch.py record/ --out save/batch --workers 4 --batch 8
+    python batch.py cam1.mp4 cam2.mp4 --classes 0 --mode zones --stride 2
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from typing import List
+import cv2
+from detect_v1 import model_init, model_prepare, prepare_input, postprocess
+from v2 import Config
+
+VIDEO_EXTS = ('.mp4', '.avi', '.mkv', '.mov', '.flv', '.ts', '.m4v')
+
+def find_videos(paths: List[str]) -> List[tuple]:
+    """
+    展开目录, 返回录像文件列表
+    :return: [(文件路径, 输出文件名), ...], 输出文件名由相对输入目录的路径得到(cam1/0800.mp4 -> cam1_0800),
+             仍有重名时加序号, 避免不同目录下的同名录像互相覆盖结果
+    """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for f in sorted(files):
+                    if f.lower().endswith(VIDEO_EXTS):
+                        full = os.path.join(root, f)
+                        videos.append((full, os.path.splitext(os.path.relpath(full, path))[0]))
+        else:
+            videos.append((path, os.path.splitext(os.path.basename(path))[0]))
+
+    result, used = [], set()
+    for path, name in videos:
+        name = name.replace(os.sep, '_').replace('/', '_')
+        unique, index = name, 2
+        while unique in used:
+            unique = f'{name}_{index}'
+            index += 1
+        used.add(unique)
+        result.append((path, unique))
+    return result
+
+def read_frames(cap, stride: int, frames: queue.Queue, stop: threading.Event):
+    """解码线程: 流式读取, 每stride帧取一帧放入有界队列, 结束(或stop被设置)时放入None"""
+    index = 0
+    while not stop.is_set():
+        if index % stride == 0:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.put((index, frame))
+        elif not cap.grab():
+            break
+        index += 1
+    frames.put(None)
+
+def merge_alarms(times: List[float], gap: float) -> List[list]:
+    """把报警帧时间合并成时间段[开始, 结束](相邻报警间隔不超过gap秒)"""
+    intervals = []
+    for t in times:
+        if intervals and t - intervals[-1][1] <= gap:
+            intervals[-1][1] = t
+        else:
+            intervals.append([t, t])
+    return intervals
+
+_model = None
+_progress = None
+
+def _init_worker(progress, model_path: str, backend: str, imgsz: int, dynamic: bool):
+    """工作进程初始化: 每个进程只加载一次模型"""
+    global _model, _progress
+    _model = model_init(model_path, backend, imgsz, dynamic)
+    _progress = progress
+
+def process_video(path: str, name: str, out_dir: str, alarm_classes: List[int], mode: str, batch: int,
+                  stride: int, imgsz: int, alarm_gap: float) -> dict:
+    """
+    处理单个录像文件
+    :param name: 输出文件名(不含扩展名)
+    :return: 该文件的汇总信息
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {'file': path, 'error': '无法打开'}
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    detections_path = os.path.join(out_dir, f'{name}.jsonl')
+
+    frames = queue.Queue(maxsize=batch * 2)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_frames, args=(cap, stride, frames, stop))
+    reader.daemon = True
+    reader.start()
+
+    start_time = time.monotonic()
+    alarm_times = []
+    processed = 0
+    done = False
+    try:
+        with open(detections_path, 'w', encoding='utf-8') as out:
+            while not done:
+                items = []
+                while len(items) < batch:
+                    item = frames.get()
+                    if item is None:
+                        done = True
+                        break
+                    items.append(item)
+                if not items:
+                    break
+
+                inputs = [prepare_input(frame, mode, Config.MASK_POINTS) for _, frame in items]
+                results = _model([model_input for model_input, _, _ in inputs],
+                                 stream=False, save=False, imgsz=imgsz, verbose=False)
+                for (index, frame), (_, masked_img, box), result in zip(items, inputs, results):
+                    _, detections, alarms, zone_alarms = postprocess(
+                        [result], frame, masked_img, box, alarm_classes, mode, Config.ZONES,
+                        Config.MASK_POINTS, render=False)
+                    if len(alarms):
+                        alarm_times.append(index / fps)
+                    if len(detections):
+                        out.write(json.dumps({
+                            'frame': index,
+                            'time': round(index / fps, 3),
+                            'alarm': bool(len(alarms)),
+                            'zones': [zone for zone, hits in zone_alarms.items() if len(hits)],
+                            'detections': [{'class_id': c, 'confidence': round(conf, 4),
+                                            'xyxy': [round(v, 1) for v in xyxy]}
+                                           for xyxy, c, conf in zip(detections['xyxy'].tolist(),
+                                                                    detections['class_id'].tolist(),
+                                                                    detections['confidence'].tolist())],
+                        }, ensure_ascii=False) + '\n')
+                processed += len(items)
+                _progress.put((path, len(items)))
+    finally:
+        # 中途出错时让解码线程退出: 通知停止并取走队列里的帧, 避免它阻塞在put上
+        stop.set()
+        while reader.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+        cap.release()
+
+    summary = {
+        'file': path,
+        'fps': fps,
+        'frames_processed': processed,
+        'video_seconds': processed * stride / fps,
+        'elapsed': time.monotonic() - start_time,
+        'alarms': merge_alarms(alarm_times, alarm_gap),
+        'detections_file': detections_path,
+    }
+    with open(os.path.join(out_dir, f'{name}_alarms.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+def _process_task(args: tuple) -> dict:
+    try:
+        return process_video(*args)
+    except Exception as e:
+        return {'file': args[0], 'error': str(e)}
+
+def count_frames(path: str, stride: int) -> int:
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    return (total + stride - 1) // stride
+
+def report_progress(progress, total: int, stop: threading.Event):
+    """进度线程: 汇总各工作进程的进度, 显示完成比例和吞吐"""
+    done = 0
+    start = time.monotonic()
+    last_print = 0.0
+    while not stop.is_set() or not progress.empty():
+        try:
+            _, count = progress.get(timeout=0.2)
+            done += count
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        if now - last_print >= 1.0:
+            last_print = now
+            elapsed = now - start
+            rate = done / elapsed if elapsed > 0 else 0.0
+            percent = f"{done * 100 / total:.1f}%" if total else "?"
+            print(f"\r进度: {done}/{total or '?'}帧 {percent}  吞吐: {rate:.1f}帧/秒", end='', flush=True)
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description="录像离线批处理")
+    parser.add_argument('paths', nargs='+', help="录像文件或目录")
+    parser.add_argument('--out', default=os.path.join('save', 'batch'), help="输出目录")
+    parser.add_argument('--classes', type=int, nargs='+', default=Config.ALARM_CLASSES, help="报警类别ID")
+    parser.add_argument('--mode', default=Config.INFER_MODE, choices=['mask', 'crop', 'zones'])
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--backend', default=Config.BACKEND)
+    parser.add_argument('--imgsz', type=int, default=Config.IMGSZ)
+    parser.add_argument('--batch', type=int, default=8, help="每次推理的帧数")
+    parser.add_argument('--stride', type=int, default=1, help="每隔几帧处理一帧")
+    parser.add_argument('--workers', type=int, default=Config.WORKERS, help="并行处理的文件数(进程数)")
+    parser.add_argument('--alarm-gap', type=float, default=2.0, help="合并报警时间段的最大间隔(秒)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.paths)
+    if not videos:
+        print("没有找到录像文件")
+        return
+    os.makedirs(args.out, exist_ok=True)
+    total = sum(count_frames(path, args.stride) for path, _ in videos)
+    print(f"{len(videos)}个文件, 约{total}帧待处理")
+
+    model_prepare(args.model, args.backend, args.imgsz, args.batch > 1)  # 导出只在主进程做一次
+    context = mp.get_context('spawn')
+    progress = context.Manager().Queue()
+    stop = threading.Event()
+    reporter = threading.Thread(target=report_progress, args=(progress, total, stop))
+    reporter.start()
+
+    start = time.monotonic()
+    tasks = [(path, name, args.out, args.classes, args.mode, args.batch, args.stride, args.imgsz, args.alarm_gap)
+             for path, name in videos]
+    summaries = []
+    workers = max(1, min(args.workers, len(videos)))
+    with context.Pool(workers, initializer=_init_worker,
+                      initargs=(progress, args.model, args.backend, args.imgsz, args.batch > 1)) as pool:
+        for summary in pool.imap_unordered(_process_task, tasks):
+            summaries.append(summary)
+    stop.set()
+    reporter.join()
+
+    elapsed = time.monotonic() - start
+    video_seconds = sum(s.get('video_seconds', 0) for s in summaries)
+    frames = sum(s.get('frames_processed', 0) for s in summaries)
+    for s in summaries:
+        if 'error' in s:
+            print(f"{s['file']}: 出错 {s['error']}")
+        else:
+            print(f"{s['file']}: {len(s['alarms'])}段报警")
+    print(f"共{frames}帧, 耗时{elapsed:.1f}秒, {frames / elapsed:.1f}帧/秒, "
+          f"录像时长的{video_seconds / elapsed:.1f}倍速")
+
+    with open(os.path.join(args.out, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+流水线分阶段性能测试
+在可复现的输入上逐阶段计时: 掩码、推理、plot、subtract/add合成、annotator、单次合成、
+BGR转RGB/QImage、帧交接, 输出各阶段p50/p95/p99和帧率, 并保存为JSON便于版本间对比.
+
+输入默认是由background2.jpg生成的合成画面(带按固定轨迹移动的色块), 也可以指定录像.
+默认使用确定性的替身检测器(背景差分找色块, 不需要权重文件), --model指定权重时使用真实模型.
+
+用法:
+    python benchmark.py --frames 300 --out save/bench/v1.json
+    python benchmark.py --input record/cam1.mp4 --model save/yolov8n.pt
+"""
+import argparse
+import json
+import os
+import platform
+import threading
+import time
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from detect_v1 import annotator, mask_img, postprocess, prepare_input
+from v2 import Config, FrameSlot
+
+BACKGROUND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'background2.jpg')
+COCO_NAMES = {0: 'person', 1: 'bicycle', 2: 'car', 3: 'motorcycle', 5: 'bus', 7: 'truck'}
+
+def synthetic_frames(count: int, width: int, height: int, shapes: int = 4, seed: int = 0):
+    """
+    由背景图生成合成帧: shapes个色块按固定的正弦轨迹移动, 同样的参数总是生成同样的画面
+    :return: (背景图, 帧生成器)
+    """
+    background = cv2.imread(BACKGROUND)
+    if background is None:
+        background = np.full((height, width, 3), 128, dtype=np.uint8)
+    background = cv2.resize(background, (width, height))
+
+    rng = np.random.default_rng(seed)
+    params = [(rng.uniform(0.1, 0.9), rng.uniform(0.2, 0.8), rng.uniform(0.05, 0.3),
+               rng.uniform(0.01, 0.05), rng.uniform(0, 2 * np.pi),
+               int(rng.integers(30, 80)), int(rng.integers(60, 160)),
+               tuple(int(c) for c in rng.integers(0, 255, 3))) for _ in range(shapes)]
+
+    def frames():
+        for i in range(count):
+            frame = background.copy()
+            for cx, cy, amp, speed, phase, w, h, color in params:
+                x = int((cx + amp * np.sin(phase + i * speed)) * width)
+                y = int(cy * height)
+                cv2.rectangle(frame, (x - w // 2, y - h // 2), (x + w // 2, y + h // 2), color, -1)
+            yield frame
+    return background, frames()
+
+def video_frames(path: str, count: int):
+    """读取录像的前count帧, 第一帧同时作为替身检测器的背景"""
+    cap = cv2.VideoCapture(path)
+    ret, first = cap.read()
+    if not ret:
+        raise RuntimeError(f"无法读取录像: {path}")
+
+    def frames():
+        yield first
+        for _ in range(count - 1):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+        cap.release()
+    return first, frames()
+
+class StubDetector:
+    """
+    确定性替身检测器
+    与背景做差分, 把变化区域的外接矩形作为检测框(类别0), 返回与YOLO相同的Results对象,
+    可选用sleep模拟推理耗时. crop模式下输入是裁剪图, 与缩放后的背景不对齐, 检测框只是近似
+    """
+    def __init__(self, background: np.ndarray, latency: float = 0.0, names: Optional[dict] = None):
+        self.background = background
+        self.latency = latency
+        self.names = names or COCO_NAMES
+
+    def _detect(self, img: np.ndarray):
+        import torch
+        from ultralytics.engine.results import Results
+
+        background = self.background
+        if background.shape != img.shape:
+            background = cv2.resize(background, (img.shape[1], img.shape[0]))
+        diff = cv2.cvtColor(cv2.absdiff(img, background), cv2.COLOR_BGR2GRAY)
+        _, binary = cv2.threshold(diff, 40, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h >= 400:
+                boxes.append([x, y, x + w, y + h, 0.9, 0])
+        data = torch.tensor(boxes, dtype=torch.float32).reshape(-1, 6)
+        return Results(orig_img=img, path='', names=self.names, boxes=data)
+
+    def __call__(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        if self.latency:
+            time.sleep(self.latency * len(images))
+        return [self._detect(img) for img in images]
+
+class StageTimer:
+    """记录各阶段耗时(秒)"""
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def time(self, stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def report(self) -> dict:
+        report = {}
+        for stage, values in self.samples.items():
+            ms = np.array(values) * 1000
+            report[stage] = {
+                'count': len(values),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'fps': float(1000 / ms.mean()) if ms.mean() > 0 else float('inf'),
+            }
+        return report
+
+def to_qimage(frame: np.ndarray):
+    """GUI中的转换: BGR转RGB后构造QImage(没有PyQt5时只做颜色转换)"""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    try:
+        from PyQt5.QtGui import QImage
+    except ImportError:
+        return rgb
+    h, w, ch = rgb.shape
+    return QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888).copy()
+
+def measure_handoff(frames: List[np.ndarray], timer: StageTimer):
+    """帧交接: 生产线程放入FrameSlot, 消费线程取走, 统计放入到取走的延迟"""
+    slot = FrameSlot()
+    ready = threading.Event()
+    done = threading.Event()
+
+    def consumer():
+        while not done.is_set() or ready.is_set():
+            if not ready.wait(timeout=0.1):
+                continue
+            ready.clear()
+            item = slot.take()
+            if item is not None:
+                timer.add('handoff', time.perf_counter() - item[0])
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    for frame in frames:
+        slot.put((time.perf_counter(), frame))
+        ready.set()
+        time.sleep(0.001)  # 留出消费时间, 模拟按帧率到达
+    done.set()
+    thread.join()
+
+def run(model, frames, args) -> dict:
+    timer = StageTimer()
+    mask_points, zones, mode = Config.MASK_POINTS, Config.ZONES, args.mode
+    alarm_classes = Config.ALARM_CLASSES
+    kept = []
+
+    for i, frame in enumerate(frames):
+        if i < args.warmup:
+            model(frame, stream=False, save=False, imgsz=Config.IMGSZ, verbose=False)
+            continue
+        frame_start = time.perf_counter()
+
+        # 原流水线: mask_img -> 推理 -> subtract/plot/add -> annotator
+        masked = frame.copy()
+        timer.time('mask_img', mask_img, masked, mask_points)
+        results = timer.time('inference', model, masked, stream=False, save=False,
+                             imgsz=Config.IMGSZ, verbose=False)
+        sub_img = timer.time('subtract', cv2.subtract, frame, masked)
+        plotted = timer.time('plot', results[0].plot)
+        rendered = timer.time('add', cv2.add, plotted, sub_img)
+        timer.time('annotator', annotator, results, rendered.copy(), alarm_classes)
+        timer.add('legacy_total', time.perf_counter() - frame_start)
+
+        # 当前流水线: prepare_input -> 推理 -> postprocess(单次合成)
+        start = time.perf_counter()
+        model_input, masked_img, box = timer.time('prepare_input', prepare_input, frame, mode, mask_points)
+        results = model(model_input, stream=False, save=False, imgsz=Config.IMGSZ, verbose=False)
+        annotated, _, _, _ = timer.time('postprocess', postprocess, results, frame, masked_img, box,
+                                        alarm_classes, mode, zones, mask_points)
+        timer.add('pipeline_total', time.perf_counter() - start)
+
+        timer.time('to_qimage', to_qimage, annotated)
+        if len(kept) < 200:
+            kept.append(frame)
+
+    measure_handoff(kept, timer)
+    return timer.report()
+
+def main():
+    parser = argparse.ArgumentParser(description="流水线分阶段性能测试")
+    parser.add_argument('--input', default=None, help="录像文件, 不指定时使用合成画面")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--shapes', type=int, default=4, help="合成画面中的移动色块数")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', default=None, help="真实模型权重, 不指定时使用替身检测器")
+    parser.add_argument('--backend', default=Config.BACKEND)
+    parser.add_argument('--stub-latency', type=float, default=0.0, help="替身检测器模拟的推理耗时(秒)")
+    parser.add_argument('--mode', default=Config.INFER_MODE, choices=['mask', 'crop', 'zones'])
+    parser.add_argument('--out', default=None, help="结果JSON路径")
+    args = parser.parse_args()
+
+    count = args.frames + args.warmup
+    if args.input:
+        background, frames = video_frames(args.input, count)
+    else:
+        background, frames = synthetic_frames(count, Config.CAMERA_WIDTH, Config.CAMERA_HEIGHT,
+                                              args.shapes, args.seed)
+    if args.model:
+        from detect_v1 import model_init
+        model = model_init(args.model, args.backend, Config.IMGSZ)
+    else:
+        model = StubDetector(background, args.stub_latency)
+
+    stages = run(model, frames, args)
+    result = {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'input': args.input or f'synthetic(shapes={args.shapes}, seed={args.seed})',
+        'frames': args.frames,
+        'frame_size': [Config.CAMERA_WIDTH, Config.CAMERA_HEIGHT],
+        'model': args.model or f'stub(latency={args.stub_latency})',
+        'mode': args.mode,
+        'stages': stages,
+    }
+
+    print(f"{'阶段':<16}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'fps':>10}")
+    for stage, s in stages.items():
+        print(f"{stage:<16}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['fps']:>10.1f}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.out}")
+
+if __name__ == '__main__':
+    main()
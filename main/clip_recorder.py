@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+class ClipRecorder:
+    """
+    报警录像(带预录)
+    采集到的帧先交给编码线程压成JPEG, 放进只保留最近pre_roll秒(另加推理延迟余量)的环形缓冲(比原始帧小得多);
+    报警时取出预录部分, 继续收集post_roll秒, 再交给写文件线程解码并写成视频.
+    push/trigger只做入队, 不在检测线程里编码或写盘
+    """
+    def __init__(self, output_dir: str, pre_roll: float = 5.0, post_roll: float = 5.0,
+                 fps: float = 10.0, quality: int = 80, prefix: str = 'alarm', latency_margin: float = 2.0):
+        """
+        :param output_dir: 录像输出目录
+        :param pre_roll: 报警前保留的秒数
+        :param post_roll: 报警后继续录制的秒数(期间再次报警会顺延)
+        :param fps: 录像帧率(采集帧率更高时按时间抽帧)
+        :param quality: JPEG质量
+        :param prefix: 文件名前缀
+        :param latency_margin: 环形缓冲在pre_roll之外多保留的秒数. 报警帧的采集时间比最新帧
+                               晚了推理延迟, 预录从报警帧往前算, 只留pre_roll秒会少掉这段延迟
+        """
+        self.output_dir = output_dir
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.fps = fps
+        self.quality = quality
+        self.prefix = prefix
+        self.latency_margin = latency_margin
+
+        self._raw = queue.Queue(maxsize=4)  # 待编码的(时间戳, 帧)
+        self._ring = deque()  # (时间戳, JPEG字节)
+        self._triggers = queue.Queue()  # (报警时间戳, 墙钟时间, 标签)
+        self._clips = queue.Queue()  # 待写文件的(文件路径, [JPEG字节])
+        self._clip = None  # 正在收集的录像: [文件路径, JPEG列表, 结束时间戳]
+        self._last_push = 0.0
+        self._threads = []
+        self.running = False
+
+        # 统计
+        self.encoded = 0
+        self.dropped = 0
+        self.ring_bytes = 0
+        self.clips_written = 0
+        self.last_clip = None
+
+    def start(self):
+        """启动编码线程和写文件线程"""
+        if self.running:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.running = True
+        self._threads = [threading.Thread(target=self._encode_loop), threading.Thread(target=self._write_loop)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """停止; 正在收集的录像按已有内容写出"""
+        if not self.running:
+            return
+        self.running = False
+        self._threads[0].join()
+        if self._clip is not None:
+            self._clips.put(tuple(self._clip[:2]))
+            self._clip = None
+        self._clips.put(None)
+        self._threads[1].join()
+        self._threads = []
+
+    def push(self, frame: np.ndarray, timestamp: float):
+        """
+        提交一帧(非阻塞, 按录像帧率抽帧, 编码跟不上时丢帧)
+        :param timestamp: 采集时间(time.monotonic())
+        """
+        if not self.running or timestamp - self._last_push < 1.0 / self.fps:
+            return
+        self._last_push = timestamp
+        try:
+            self._raw.put_nowait((timestamp, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def trigger(self, timestamp: float, label: str = ''):
+        """
+        报警: 录制timestamp前pre_roll秒到后post_roll秒(非阻塞)
+        :param timestamp: 报警帧的采集时间(time.monotonic())
+        :param label: 附加在文件名中的标签
+        """
+        if self.running:
+            self._triggers.put((timestamp, time.time(), label))
+
+    def _encode_loop(self):
+        """编码线程: 压缩JPEG, 维护预录环形缓冲, 收集报警录像"""
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while self.running:
+            try:
+                timestamp, frame = self._raw.get(timeout=0.1)
+            except queue.Empty:
+                timestamp = None
+            else:
+                ok, jpeg = cv2.imencode('.jpg', frame, params)
+                if ok:
+                    jpeg = jpeg.tobytes()
+                    self.encoded += 1
+                    self._ring.append((timestamp, jpeg))
+                    self.ring_bytes += len(jpeg)
+                    if self._clip is not None:
+                        self._clip[1].append(jpeg)
+
+            self._handle_triggers()
+            if timestamp is None:
+                continue
+
+            # 收集够post_roll后交给写文件线程
+            if self._clip is not None and timestamp >= self._clip[2]:
+                self._clips.put(tuple(self._clip[:2]))
+                self._clip = None
+
+            # 只保留最近pre_roll秒(加上推理延迟的余量)
+            while self._ring and self._ring[0][0] < timestamp - self.pre_roll - self.latency_margin:
+                self.ring_bytes -= len(self._ring.popleft()[1])
+
+    def _handle_triggers(self):
+        while True:
+            try:
+                alarm_time, wall_time, label = self._triggers.get_nowait()
+            except queue.Empty:
+                return
+            end = alarm_time + self.post_roll
+            if self._clip is not None:
+                self._clip[2] = max(self._clip[2], end)  # 录制中再次报警, 顺延
+                continue
+            name = time.strftime('%Y%m%d_%H%M%S', time.localtime(wall_time))
+            if label:
+                name += f'_{label}'
+            path = os.path.join(self.output_dir, f'{self.prefix}_{name}.mp4')
+            frames = [jpeg for ts, jpeg in self._ring if ts >= alarm_time - self.pre_roll]
+            self._clip = [path, frames, end]
+
+    def _write_loop(self):
+        """写文件线程: 解码JPEG并写成视频"""
+        while True:
+            job = self._clips.get()
+            if job is None:
+                break
+            path, frames = job
+            if not frames:
+                continue
+            writer = None
+            try:
+                for jpeg in frames:
+                    frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (w, h))
+                    writer.write(frame)
+                self.clips_written += 1
+                self.last_clip = path
+                print(f"报警录像已保存: {path}")
+            except Exception as e:
+                print(f"写入报警录像失败: {e}")
+            finally:
+                if writer is not None:
+                    writer.release()
+
+    def stats(self) -> dict:
+        return {
+            'ring_frames': len(self._ring),
+            'ring_bytes': self.ring_bytes,
+            'encoded': self.encoded,
+            'dropped': self.dropped,
+            'recording': self._clip is not None,
+            'clips_written': self.clips_written,
+            'last_clip': self.last_clip,
+        }
@@ -1,21 +1,31 @@
 import cv2
 import numpy as np
 from ultralytics import YOLO
-import pygame
 import time
 import supervision as sv
 import os
-from typing import List
+from backends import load_model, prepare_model
+from alarm_audio import AlarmAudio
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 # 配置参数
 class Config:
     # 默认报警类别（对应YOLO类别ID），0=person, 1=bicycle, 2=car等
     ALARM_CLASSES = [0]  
     MODEL_PATH = os.path.join('save', 'yolov8n.pt')
+    BACKEND = 'torch'  # 推理后端: 'torch' / 'onnx'(ONNX Runtime) / 'openvino' / 'onnx_int8'(quantize.py生成)
+    EXPORT_CACHE_DIR = os.path.join('save', 'export_cache')  # 非torch后端的导出缓存目录
     SOUND_FILE = 'You.mp3'
     CAMERA_WIDTH = 680
     CAMERA_HEIGHT = 480
     COOL_TIME = 5  # 警报冷却时间(秒)
+    MASK_CACHE_SIZE = 16  # 掩码缓存容量(按帧尺寸+区域坐标区分)
+    IMGSZ = 640  # 推理输入尺寸
+    # 推理模式: 'mask'=整帧掩码后推理, 'crop'=只推理监测区域外接矩形,
+    # 'zones'=整帧推理一次后按多个区域过滤
+    INFER_MODE = 'mask'
     
     # 监测区域坐标(相对于图像大小的比例)
     MASK_POINTS = [
@@ -24,92 +34,422 @@ class Config:
         (5.5/10, 9.9/10),  # 右下
         (0.1/10, 9.9/10)   # 左下
     ]
+    
+    # 多区域模式下的区域列表(坐标同MASK_POINTS), classes为该区域的报警类别,
+    # classes为None或不填时使用界面/命令行选择的报警类别
+    ZONES = [
+        {'name': '区域1', 'points': MASK_POINTS, 'classes': None},
+    ]
 
-def model_init(model_path: str) -> YOLO:
-    """初始化YOLO模型"""
+def model_init(model_path: str, backend: str = Config.BACKEND, imgsz: int = Config.IMGSZ,
+               dynamic: bool = False) -> YOLO:
+    """
+    初始化YOLO模型
+    :param model_path: 权重路径
+    :param backend: 推理后端, 非torch后端首次使用时导出并缓存(按权重哈希和imgsz)
+    :param imgsz: 推理输入尺寸
+    :param dynamic: 导出动态shape(多路batch推理时需要)
+    """
     try:
-        model = YOLO(model_path)
+        model = load_model(model_path, backend, imgsz, dynamic, Config.EXPORT_CACHE_DIR)
         return model
     except Exception as e:
         print(f"模型加载失败: {e}")
         raise
 
-def annotator(results, frame: np.ndarray, alarm_classes: List[int]) -> tuple:
+def model_prepare(model_path: str, backend: str = Config.BACKEND, imgsz: int = Config.IMGSZ,
+                  dynamic: bool = False):
+    """多进程加载同一模型前, 在主进程中先完成非torch后端的导出(参数同model_init)"""
+    prepare_model(model_path, backend, imgsz, dynamic, Config.EXPORT_CACHE_DIR)
+
+# 结构化检测结果: 检测框, 类别, 置信度
+# track_id: 跟踪ID, 未跟踪时为-1
+ALARM_DTYPE = np.dtype([('xyxy', np.float32, (4,)), ('class_id', np.int32), ('confidence', np.float32),
+                        ('track_id', np.int32)])
+
+_box_annotator = None
+
+def get_box_annotator() -> sv.BoxAnnotator:
+    """获取复用的BoxAnnotator(无状态, 不必每帧新建)"""
+    global _box_annotator
+    if _box_annotator is None:
+        _box_annotator = sv.BoxAnnotator(
+            color=sv.ColorPalette.default(), 
+            thickness=3, 
+            text_thickness=3,
+            text_scale=1
+        )
+    return _box_annotator
+
+def detections_array(results) -> np.ndarray:
+    """
+    把YOLO检测结果转成结构化数组(每帧只做一次设备到主机的拷贝)
+    :param results: YOLO检测结果
+    :return: (N,) ALARM_DTYPE数组
+    """
+    # boxes.data每行: x1, y1, x2, y2, [track_id,] conf, cls
+    data = results[0].boxes.data.cpu().numpy()
+    detections = np.empty(len(data), dtype=ALARM_DTYPE)
+    detections['xyxy'] = data[:, :4]
+    detections['confidence'] = data[:, -2]
+    detections['class_id'] = data[:, -1]
+    detections['track_id'] = -1
+    return detections
+
+def annotator(results, frame: np.ndarray, alarm_classes: List[int],
+              detections: Optional[np.ndarray] = None) -> tuple:
     """
     标注检测结果
     :param results: YOLO检测结果
     :param frame: 原始帧
     :param alarm_classes: 需要报警的类别列表
-    :return: 标注后的帧, 检测到的报警类别列表
+    :param detections: 已转换好的结构化检测结果, 为None时从results转换
+    :return: 标注后的帧, 报警检测(ALARM_DTYPE结构化数组: 检测框/类别/置信度)
     """
-    box_annotator = sv.BoxAnnotator(
-        color=sv.ColorPalette.default(), 
-        thickness=3, 
-        text_thickness=3,
-        text_scale=1
-    )
+    if detections is None:
+        detections = detections_array(results)
+    alarm_detected = detections[np.isin(detections['class_id'], alarm_classes)]
     
-    alarm_detected = []
-    for result in results[0]:
-        class_id = result.boxes.cls.cpu().numpy().astype(int)
-        if class_id in alarm_classes:
-            alarm_detected.append(class_id)
-    
-    detections = sv.Detections.from_ultralytics(results[0])
-    frame = box_annotator.annotate(scene=frame, detections=detections)
+    sv_detections = sv.Detections(
+        xyxy=detections['xyxy'],
+        confidence=detections['confidence'],
+        class_id=detections['class_id']
+    )
+    frame = get_box_annotator().annotate(scene=frame, detections=sv_detections)
     return frame, alarm_detected
 
-def trigger(sound_file: str) -> None:
-    """播放警报声音"""
-    try:
-        pygame.mixer.init()
-        pygame.mixer.music.load(sound_file)
-        pygame.mixer.music.play()
-        time.sleep(2)
-        pygame.mixer.music.stop()
-        pygame.mixer.quit()  # 释放资源
-    except Exception as e:
-        print(f"播放声音失败: {e}")
+BOX_COLORS = [(56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+              (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0)]
+
+def compose(frame: np.ndarray, detections: np.ndarray, names: dict,
+            mode: str, mask_points: List[tuple], zones: List[dict],
+            out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    单次合成标注画面
+    把原始帧拷进输出缓冲, 再一次性画出监测区域、检测框和标签,
+    取代 subtract -> plot -> add -> annotate 的多次整帧处理和重复画框
+    :param frame: 原始帧
+    :param detections: 结构化检测结果(ALARM_DTYPE)
+    :param names: 类别名 {类别ID: 名称}
+    :param mode: 推理模式(决定画单个区域还是多区域)
+    :param mask_points: 单区域模式下的监测区域
+    :param zones: 多区域模式下的区域列表
+    :param out: 输出缓冲(例如共享内存槽位), 为None时新建(返回的画面归调用方所有)
+    :return: 标注后的帧
+    """
+    if out is None:
+        out = np.empty_like(frame)
+    np.copyto(out, frame)
+    draw_roi(out, mode, mask_points, zones)
+    
+    for (x1, y1, x2, y2), class_id, conf in zip(detections['xyxy'].astype(np.int32).tolist(),
+                                               detections['class_id'].tolist(),
+                                               detections['confidence'].tolist()):
+        color = BOX_COLORS[class_id % len(BOX_COLORS)]
+        cv2.rectangle(out, (x1, y1), (x2, y2), color, 2)
+        label = f"{names.get(class_id, class_id)} {conf:.2f}"
+        (tw, th), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+        ty = max(y1, th + baseline)
+        cv2.rectangle(out, (x1, ty - th - baseline), (x1 + tw, ty), color, -1)
+        cv2.putText(out, label, (x1, ty - baseline), cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                    (255, 255, 255), 1, cv2.LINE_AA)
+    return out
+
+class MaskCache:
+    """
+    监测区域掩码缓存(LRU)
+    以(帧尺寸, 区域坐标)为键，区域不变时复用已栅格化的掩码，
+    区域坐标变化时自然生成新键，旧掩码按LRU淘汰
+    """
+    def __init__(self, maxsize: int = Config.MASK_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(shape: tuple, mask_points: List[tuple]) -> tuple:
+        return (tuple(shape), tuple((float(x), float(y)) for x, y in mask_points))
+
+    def get(self, shape: tuple, mask_points: List[tuple]) -> dict:
+        """
+        获取掩码缓存项
+        :param shape: 图像尺寸(h, w)或(h, w, c)
+        :param mask_points: 监测区域坐标比例列表
+        :return: {'pts': 像素坐标, 'mask': 与shape同形状的0/255掩码, 'bbox': 外接矩形(x0, y0, x1, y1)}
+        """
+        key = self.make_key(shape, mask_points)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        
+        entry = self._build(shape, mask_points)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _build(shape: tuple, mask_points: List[tuple]) -> dict:
+        h, w = shape[0], shape[1]
+        # 将比例坐标转换为实际像素坐标
+        pts = np.array([
+            [w * x, h * y] for x, y in mask_points
+        ], np.int32).reshape((-1, 1, 2))
+        
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [pts], 255)
+        if len(shape) == 3:
+            # 多通道图像直接用同形状掩码做按位与，避免每帧广播
+            mask = np.ascontiguousarray(np.repeat(mask[:, :, None], shape[2], axis=2))
+        
+        # 区域外接矩形(裁剪到图像范围内)
+        x, y, bw, bh = cv2.boundingRect(pts)
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(w, x + bw), min(h, y + bh)
+        return {'pts': pts, 'mask': mask, 'bbox': (x0, y0, x1, y1)}
+
+    def zone_map(self, shape: tuple, zones: List[dict]) -> np.ndarray:
+        """
+        获取多区域标签图: 每个像素为int32位图, 第z位表示是否在第z个区域内
+        :param shape: 图像尺寸
+        :param zones: 区域列表
+        :return: (h, w)的int32标签图
+        """
+        key = ('zones', tuple(shape[:2])) + tuple(
+            self.make_key((), zone['points'])[1] for zone in zones)
+        with self._lock:
+            label_map = self._entries.get(key)
+            if label_map is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return label_map
+        
+        if len(zones) > 31:
+            raise ValueError(f"区域数量过多: {len(zones)} (最多31个)")
+        label_map = np.zeros(shape[:2], dtype=np.int32)
+        for z, zone in enumerate(zones):
+            mask = self.get(shape[:2], zone['points'])['mask']
+            label_map[mask > 0] |= (1 << z)
+        
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = label_map
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return label_map
+
+    def clear(self):
+        """清空缓存(例如摄像头分辨率变化后)"""
+        with self._lock:
+            self._entries.clear()
+
+_mask_cache = MaskCache()
 
 def mask_img(img: np.ndarray, mask_points: List[tuple]) -> np.ndarray:
     """
-    创建监测区域掩码
-    :param img: 原始图像
+    创建监测区域掩码(原地修改img)
+    :param img: 原始图像(会被原地掩码，调用方需传入副本)
     :param mask_points: 监测区域坐标比例列表[(x1,y1), (x2,y2), ...]
     :return: 掩码后的图像
     """
-    mask = np.zeros([img.shape[0], img.shape[1]], dtype=np.uint8)
+    entry = _mask_cache.get(img.shape, mask_points)
     
-    # 将比例坐标转换为实际像素坐标
-    pts = np.array([
-        [img.shape[1] * x, img.shape[0] * y] for x, y in mask_points
-    ], np.int32).reshape((-1, 1, 2))
-    
-    mask = cv2.fillPoly(mask, [pts], (255, 0, 0))
+    cv2.polylines(img, [entry['pts']], isClosed=True, color=(255, 0, 0), thickness=2)
+    # 区域外像素清零，结果直接写回img，不再分配新的整帧图像
+    cv2.bitwise_and(img, entry['mask'], dst=img)
+    return img
+
+def roi_mask(shape: tuple, mask_points: List[tuple]) -> np.ndarray:
+    """
+    获取缓存的监测区域掩码(只读, 不要修改返回值)
+    :param shape: 图像尺寸
+    :param mask_points: 监测区域坐标比例列表
+    :return: 与shape同形状的0/255掩码
+    """
+    return _mask_cache.get(shape, mask_points)['mask']
+
+def roi_box(shape: tuple, mask_points: List[tuple], mode: str = Config.INFER_MODE) -> Optional[Tuple[int, int, int, int]]:
+    """
+    获取推理用的裁剪框
+    :param shape: 图像尺寸
+    :param mask_points: 监测区域坐标比例列表
+    :param mode: 推理模式, 仅'crop'模式返回裁剪框
+    :return: (x0, y0, x1, y1), 非裁剪模式返回None
+    """
+    if mode != 'crop':
+        return None
+    return _mask_cache.get(shape, mask_points)['bbox']
+
+def restore_crop(result, full_img: np.ndarray, box: Tuple[int, int, int, int]) -> None:
+    """
+    将裁剪图上的检测结果映射回整帧坐标(原地修改result)
+    :param result: 单张图的YOLO检测结果
+    :param full_img: 整帧图像(用于后续plot)
+    :param box: 裁剪框(x0, y0, x1, y1)
+    """
+    x0, y0 = box[0], box[1]
+    data = result.boxes.data.clone()
+    data[:, [0, 2]] += x0
+    data[:, [1, 3]] += y0
+    result.orig_img = full_img
+    result.orig_shape = full_img.shape[:2]
+    result.update(boxes=data)
+
+ZONE_COLORS = [(255, 0, 0), (0, 165, 255), (0, 255, 255), (255, 0, 255), (0, 255, 0)]
+
+def draw_zones(img: np.ndarray, zones: List[dict]) -> None:
+    """在图像上绘制所有区域边界(原地修改)"""
+    for z, zone in enumerate(zones):
+        pts = _mask_cache.get(img.shape[:2], zone['points'])['pts']
+        color = ZONE_COLORS[z % len(ZONE_COLORS)]
+        cv2.polylines(img, [pts], isClosed=True, color=color, thickness=2)
+
+def draw_roi(img: np.ndarray, mode: str, mask_points: List[tuple], zones: List[dict]) -> None:
+    """按推理模式绘制监测区域或各区域边界(原地修改)"""
+    if mode == 'zones':
+        draw_zones(img, zones)
+        return
+    pts = _mask_cache.get(img.shape[:2], mask_points)['pts']
     cv2.polylines(img, [pts], isClosed=True, color=(255, 0, 0), thickness=2)
-    masked_img = cv2.add(img, np.zeros(np.shape(img), dtype=np.uint8), mask=mask) 
-    return masked_img
 
-def predicter(model: YOLO, img: np.ndarray, masked_img: np.ndarray) -> tuple:
+def zone_hits(xyxy: np.ndarray, shape: tuple, zones: List[dict]) -> np.ndarray:
+    """
+    判断检测框属于哪些区域(以检测框底边中点为锚点, 一次向量化查表)
+    :param xyxy: (N, 4)检测框
+    :param shape: 图像尺寸
+    :param zones: 区域列表
+    :return: (N, Z)布尔矩阵, [i, z]表示第i个框在第z个区域内
+    """
+    if len(xyxy) == 0 or not zones:
+        return np.zeros((len(xyxy), len(zones)), dtype=bool)
+    
+    label_map = _mask_cache.zone_map(shape, zones)
+    h, w = label_map.shape
+    xs = np.clip(((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(np.int32), 0, w - 1)
+    ys = np.clip(xyxy[:, 3].astype(np.int32), 0, h - 1)
+    labels = label_map[ys, xs]
+    bits = np.arange(len(zones), dtype=np.int32)
+    return ((labels[:, None] >> bits) & 1).astype(bool)
+
+def zone_classes(zone: dict, alarm_classes: List[int]) -> List[int]:
+    """区域的报警类别, 区域未指定(None或不填)时用选择的报警类别"""
+    classes = zone.get('classes')
+    return alarm_classes if classes is None else classes
+
+def zone_alarms(detections: np.ndarray, shape: tuple, zones: List[dict], alarm_classes: List[int]) -> tuple:
+    """
+    多区域报警判断
+    :param detections: 整帧的结构化检测结果(ALARM_DTYPE)
+    :param shape: 图像尺寸
+    :param zones: 区域列表
+    :param alarm_classes: 区域未指定classes(None或不填)时使用的报警类别
+    :return: 任一区域内的报警检测, {区域名: 该区域的报警检测}(只包含触发报警的区域)
+    """
+    hits = zone_hits(detections['xyxy'], shape, zones)
+    
+    alarms = {}
+    matched_any = np.zeros(len(detections), dtype=bool)
+    for z, zone in enumerate(zones):
+        matched = hits[:, z] & np.isin(detections['class_id'], zone_classes(zone, alarm_classes))
+        if matched.any():
+            alarms[zone['name']] = detections[matched]
+            matched_any |= matched
+    return detections[matched_any], alarms
+
+def match_alarms(detections: np.ndarray, shape: tuple, mode: str, zones: List[dict],
+                 alarm_classes: List[int]) -> tuple:
+    """
+    按推理模式从检测结果中筛出报警检测
+    :return: 报警检测, 各区域报警{区域名: 报警检测}(非多区域模式为空)
+    """
+    if mode == 'zones':
+        return zone_alarms(detections, shape, zones, alarm_classes)
+    return detections[np.isin(detections['class_id'], alarm_classes)], {}
+
+def prepare_input(frame: np.ndarray, mode: str = Config.INFER_MODE,
+                  mask_points: List[tuple] = Config.MASK_POINTS) -> tuple:
+    """
+    按推理模式生成模型输入(可与其它帧拼成一个batch)
+    :param frame: 原始帧
+    :param mode: 推理模式('mask' / 'crop' / 'zones')
+    :param mask_points: 单区域模式下的监测区域
+    :return: 模型输入, 掩码后的图像, 裁剪框(非裁剪模式为None)
+    """
+    if mode == 'zones':
+        # 多区域模式整帧推理, 不做掩码
+        return frame, frame, None
+    
+    masked_img = mask_img(frame.copy(), mask_points)
+    box = roi_box(frame.shape, mask_points, mode)
+    if box is None:
+        return masked_img, masked_img, None
+    x0, y0, x1, y1 = box
+    return masked_img[y0:y1, x0:x1], masked_img, box
+
+def postprocess(results, frame: np.ndarray, masked_img: np.ndarray,
+                box: Optional[Tuple[int, int, int, int]], alarm_classes: List[int],
+                mode: str = Config.INFER_MODE, zones: List[dict] = Config.ZONES,
+                mask_points: List[tuple] = Config.MASK_POINTS,
+                out: Optional[np.ndarray] = None, render: bool = True) -> tuple:
+    """
+    单帧推理结果的坐标还原、报警判断和标注合成
+    :param results: 该帧的YOLO检测结果(单元素列表)
+    :param frame: 原始帧
+    :param masked_img: prepare_input返回的掩码图
+    :param box: prepare_input返回的裁剪框
+    :param alarm_classes: 报警类别列表
+    :param mode: 推理模式
+    :param zones: 多区域模式下的区域列表
+    :param mask_points: 单区域模式下的监测区域(用于画区域边界)
+    :param out: 标注画面的输出缓冲, 为None时新建
+    :param render: 是否合成标注画面(无人观看的服务模式下不画)
+    :return: 标注后的帧(不画时为None), 全部检测(ALARM_DTYPE), 报警检测, 各区域报警{区域名: 报警检测}
+    """
+    if box is not None:
+        restore_crop(results[0], masked_img, box)
+    
+    detections = detections_array(results)
+    alarms, zones_hit = match_alarms(detections, frame.shape, mode, zones, alarm_classes)
+    
+    if not render:
+        return None, detections, alarms, zones_hit
+    
+    # 原图 + 区域边界 + 检测框/标签, 一次合成
+    annotated_frame = compose(frame, detections, results[0].names, mode, mask_points, zones, out)
+    return annotated_frame, detections, alarms, zones_hit
+
+def detect_frame(model: YOLO, frame: np.ndarray, alarm_classes: List[int],
+                 mode: str = Config.INFER_MODE, mask_points: List[tuple] = Config.MASK_POINTS,
+                 zones: List[dict] = Config.ZONES, imgsz: int = Config.IMGSZ) -> tuple:
     """
-    进行目标检测
+    按推理模式完成单帧的掩码、推理、标注和报警判断
     :param model: YOLO模型
-    :param img: 原始图像
-    :param masked_img: 掩码后的图像
-    :return: 检测结果, 处理后的图像
+    :param frame: 原始帧
+    :param alarm_classes: 报警类别列表
+    :param mode: 推理模式('mask' / 'crop' / 'zones')
+    :param mask_points: 单区域模式下的监测区域
+    :param zones: 多区域模式下的区域列表
+    :param imgsz: 推理输入尺寸
+    :return: 检测结果, 标注后的帧, 报警检测(ALARM_DTYPE), 各区域报警{区域名: 报警检测}
     """
-    results = model(masked_img, stream=False, save=False, imgsz=640)
+    model_input, masked_img, box = prepare_input(frame, mode, mask_points)
+    results = model(model_input, stream=False, save=False, imgsz=imgsz)
     
     # 打印检测到的类别
     detected_classes = results[0].boxes.cls.tolist()
     print(f"检测到的类别: {detected_classes}")
     
-    # 可视化处理
-    sub_img = cv2.subtract(img, masked_img)
-    masked_img_detected = results[0].plot()
-    result_img = cv2.add(masked_img_detected, sub_img)
-    
-    return results, result_img
+    annotated_frame, _, alarms, zones_hit = postprocess(
+        results, frame, masked_img, box, alarm_classes, mode, zones, mask_points)
+    return results, annotated_frame, alarms, zones_hit
 
 def select_alarm_classes() -> List[int]:
     """让用户选择需要报警的类别"""
@@ -130,7 +470,7 @@ def main():
     alarm_classes = select_alarm_classes()
     
     # 初始化模型
-    model = model_init(Config.MODEL_PATH)
+    model = model_init(Config.MODEL_PATH, Config.BACKEND, Config.IMGSZ)
     
     # 初始化摄像头
     cap = cv2.VideoCapture(0)
@@ -141,8 +481,9 @@ def main():
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAMERA_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAMERA_HEIGHT)
     
-    # 初始化pygame音频
-    pygame.mixer.init()
+    # 报警音频服务(声音只解码一次, 播放不阻塞检测循环)
+    audio = AlarmAudio(Config.SOUND_FILE)
+    audio.start()
     
     last_alert_time = 0  # 上次报警时间
     
@@ -153,23 +494,19 @@ def main():
                 print("无法读取摄像头帧")
                 break
             
-            # 应用监测区域掩码
-            masked_img = mask_img(frame.copy(), Config.MASK_POINTS)
-            
-            # 进行目标检测
-            results, processed_img = predicter(model, frame, masked_img)
-            
-            # 标注结果
-            annotated_frame, alarms = annotator(results, processed_img, alarm_classes)
+            # 掩码/推理/标注
+            results, annotated_frame, alarms, _ = detect_frame(
+                model, frame, alarm_classes, Config.INFER_MODE,
+                Config.MASK_POINTS, Config.ZONES, Config.IMGSZ)
             
             # 显示结果
             cv2.imshow("入侵检测系统", annotated_frame)
             
             # 检查是否需要触发警报
-            if alarms and (time.time() - last_alert_time) >= Config.COOL_TIME:
-                trigger(Config.SOUND_FILE)
+            if len(alarms) and (time.time() - last_alert_time) >= Config.COOL_TIME:
+                audio.play()
                 last_alert_time = time.time()
-                print(f"警报触发! 检测到类别: {alarms}")
+                print(f"警报触发! 检测到类别: {alarms['class_id'].tolist()}")
             
             # 按'q'退出
             if cv2.waitKey(1) & 0xFF == ord("q"):
@@ -179,7 +516,7 @@ def main():
         # 释放资源
         cap.release()
         cv2.destroyAllWindows()
-        pygame.mixer.quit()
+        audio.stop()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,172 @@
+import queue
+import sqlite3
+from contextlib import closing
+import threading
+import time
+from typing import List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    type TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    seq INTEGER,
+    zone TEXT,
+    class_id INTEGER,
+    confidence REAL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+    track_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (time);
+CREATE INDEX IF NOT EXISTS idx_events_class_time ON events (class_id, time);
+CREATE INDEX IF NOT EXISTS idx_events_zone_time ON events (zone, time);
+CREATE INDEX IF NOT EXISTS idx_events_camera_time ON events (camera, time);
+"""
+
+COLUMNS = ('id', 'time', 'type', 'camera', 'seq', 'zone', 'class_id', 'confidence',
+           'x1', 'y1', 'x2', 'y2', 'track_id')
+
+class EventStore:
+    """
+    报警/检测事件库(SQLite, WAL模式)
+    作为VideoProcessor.add_listener的订阅者使用: 检测线程只把事件放进队列,
+    后台写线程按批(一个事务)写入, 检测线程不会等待磁盘.
+    每个检测目标一行(属于多个区域时每个区域一行)
+    """
+    def __init__(self, path: str, store_detections: bool = True, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 10000):
+        """
+        :param path: 数据库文件路径
+        :param store_detections: 是否保存detection事件(否则只保存alarm事件)
+        :param batch_size: 每批最多写入的事件数
+        :param flush_interval: 最长攒批时间(秒)
+        :param max_pending: 队列长度, 写入跟不上时丢弃新事件
+        """
+        self.path = path
+        self.store_detections = store_detections
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+        # 统计
+        self.rows_written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def start(self):
+        """启动后台写线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """写完队列中剩余的事件后停止"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def __call__(self, event: dict):
+        """事件订阅回调(非阻塞)"""
+        if event['type'] != 'alarm' and not self.store_detections:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    @staticmethod
+    def _rows(event: dict) -> list:
+        rows = []
+        for det in event['detections']:
+            x1, y1, x2, y2 = det['xyxy']
+            for zone in det.get('zones') or [None]:
+                rows.append((event['time'], event['type'], event['camera'], event['seq'], zone,
+                             det['class_id'], det['confidence'], x1, y1, x2, y2, det.get('track_id', -1)))
+        return rows
+
+    def _run(self):
+        """后台写线程: 攒够一批或到了攒批时间就在一个事务中写入"""
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            if not batch:
+                continue
+
+            rows = [row for event in batch for row in self._rows(event)]
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO events (time, type, camera, seq, zone, class_id, confidence, '
+                        'x1, y1, x2, y2, track_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                self.rows_written += len(rows)
+                self.batches += 1
+            except sqlite3.Error as e:
+                print(f"写入事件库失败: {e}")
+        conn.close()
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              class_id: Optional[int] = None, zone: Optional[str] = None,
+              camera: Optional[str] = None, event_type: Optional[str] = None,
+              limit: int = 1000) -> List[dict]:
+        """
+        按条件查询事件(可与写线程并发)
+        :param start: 起始时间(time.time()时间戳, 含)
+        :param end: 结束时间(不含)
+        :param class_id: 类别ID
+        :param zone: 区域名
+        :param camera: 摄像头名
+        :param event_type: 'alarm' / 'detection'
+        :param limit: 最多返回条数(按时间倒序)
+        :return: 事件行列表
+        """
+        conditions, params = [], []
+        for column, op, value in (('time', '>=', start), ('time', '<', end), ('class_id', '=', class_id),
+                                  ('zone', '=', zone), ('camera', '=', camera), ('type', '=', event_type)):
+            if value is not None:
+                conditions.append(f'{column} {op} ?')
+                params.append(value)
+        sql = f'SELECT {", ".join(COLUMNS)} FROM events'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY time DESC LIMIT ?'
+        params.append(limit)
+
+        conn = self._connect()
+        try:
+            return [dict(zip(COLUMNS, row)) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            'pending': self._queue.qsize(),
+            'rows_written': self.rows_written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+        }
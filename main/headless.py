@@ -0,0 +1,172 @@
+"""
+无界面检测服务
+在无人值守的服务器上运行: 不合成标注画面、不显示窗口, 只把检测/报警事件按JSON行输出.
+配置可以来自JSON文件(键为v2.Config中的配置项), 命令行参数优先.
+--show时才挂上显示订阅, 合成并显示标注画面(调试用).
+
+用法:
+    python headless.py --config server.json --events events.jsonl
+    python headless.py --source rtsp://192.168.1.10/stream --classes 0 2 --no-sound
+
+配置文件示例:
+    {"CAMERAS": [{"name": "门口", "source": "rtsp://..."}], "ALARM_CLASSES": [0],
+     "INFER_MODE": "crop", "MOTION_GATE": true, "SOUND_FILE": null}
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+import cv2
+from profiler import install_signal_handler
+from v2 import Config, CaptureThread, create_processor
+
+def load_config(path: str):
+    """
+    用JSON配置文件覆盖v2.Config
+    :param path: 配置文件路径, 键必须是Config中已有的配置项
+    """
+    with open(path, encoding='utf-8') as f:
+        overrides = json.load(f)
+    for key, value in overrides.items():
+        if not key.isupper() or not hasattr(Config, key):
+            raise KeyError(f"未知配置项: {key}")
+        setattr(Config, key, value)
+
+class EventWriter:
+    """检测/报警事件订阅者: 每个事件写一行JSON"""
+    def __init__(self, path: str = None, alarms_only: bool = False):
+        """
+        :param path: 输出文件(追加), 为None时写到标准输出
+        :param alarms_only: 只输出报警事件
+        """
+        self.file = open(path, 'a', encoding='utf-8') if path else sys.stdout
+        self.alarms_only = alarms_only
+        self._lock = threading.Lock()
+        self.counts = {'detection': 0, 'alarm': 0}
+
+    def __call__(self, event: dict):
+        self.counts[event['type']] += 1
+        if self.alarms_only and event['type'] != 'alarm':
+            return
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+def show_results(processor) -> bool:
+    """显示订阅: 取各路最新标注画面并显示, 按q返回False"""
+    for camera, stream in enumerate(processor.streams):
+        result = processor.get_result(camera)
+        if result is not None and result[0] is not None:
+            cv2.imshow(f"入侵检测系统 - {stream.name}", result[0])
+            processor.mark_displayed(result[2])
+    return cv2.waitKey(1) & 0xFF != ord('q')
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面检测服务, 输出检测/报警事件")
+    parser.add_argument('--config', default=None, help="JSON配置文件(覆盖v2.Config)")
+    parser.add_argument('--source', action='append', default=None,
+                        help="摄像头序号或视频流地址, 可重复指定(覆盖配置中的CAMERAS)")
+    parser.add_argument('--classes', type=int, nargs='+', default=None, help="报警类别ID")
+    parser.add_argument('--model', default=None, help="模型权重")
+    parser.add_argument('--backend', default=None, help="推理后端")
+    parser.add_argument('--mode', default=None, choices=['mask', 'crop', 'zones'], help="推理模式")
+    parser.add_argument('--execution', default=None, choices=['thread', 'process'], help="执行方式")
+    parser.add_argument('--events', default=None, help="事件输出文件(JSON行, 追加), 默认标准输出")
+    parser.add_argument('--db', default=None, help="事件库(SQLite)路径, 覆盖配置中的EVENT_DB")
+    parser.add_argument('--metrics-port', type=int, default=None, help="指标端口(/metrics), 覆盖配置中的METRICS_PORT")
+    parser.add_argument('--alarms-only', action='store_true', help="只输出报警事件")
+    parser.add_argument('--no-sound', action='store_true', help="报警时不播放声音")
+    parser.add_argument('--show', action='store_true', help="显示标注画面(调试用)")
+    parser.add_argument('--trace', default=None, help="停止时导出逐帧延迟追踪(JSON行), 覆盖配置中的TRACE_FILE")
+    parser.add_argument('--stats-interval', type=float, default=60, help="状态输出间隔(秒), 0为不输出")
+    args = parser.parse_args()
+
+    if args.config:
+        load_config(args.config)
+    if args.source:
+        Config.CAMERAS = [{'name': f"摄像头{i}", 'source': int(source) if source.isdigit() else source}
+                          for i, source in enumerate(args.source)]
+    if args.classes is not None:
+        Config.ALARM_CLASSES = args.classes
+    if args.model:
+        Config.MODEL_PATH = args.model
+    if args.backend:
+        Config.BACKEND = args.backend
+    if args.mode:
+        Config.INFER_MODE = args.mode
+    if args.execution:
+        Config.EXECUTION = args.execution
+    if args.db:
+        Config.EVENT_DB = args.db
+    if args.metrics_port:
+        Config.METRICS_PORT = args.metrics_port
+    if args.trace:
+        Config.TRACE_FILE = args.trace
+
+    processor = create_processor(Config.CAMERAS, render=args.show)
+    if args.no_sound:
+        processor.audio = None
+    writer = EventWriter(args.events, args.alarms_only)
+    processor.add_listener(writer)
+
+    captures = []
+    for camera, stream in enumerate(processor.streams):
+        capture = CaptureThread(processor, camera)
+        if not capture.open():
+            print(f"无法打开摄像头: {stream.name}", file=sys.stderr)
+            for opened in captures:
+                opened.stop()
+            return
+        captures.append(capture)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    install_signal_handler()  # kill -USR1 <pid> 开始采样分析
+
+    processor.start()
+    for capture in captures:
+        capture.start()
+    print(f"检测服务已启动: {len(captures)}路", file=sys.stderr)
+
+    last_stats = time.monotonic()
+    try:
+        while not stopping.is_set():
+            if all(capture.failed for capture in captures):
+                print("所有摄像头都已断开", file=sys.stderr)
+                break
+            if args.show:
+                if not show_results(processor):
+                    break
+            else:
+                stopping.wait(0.5)
+
+            now = time.monotonic()
+            if args.stats_interval and now - last_stats >= args.stats_interval:
+                last_stats = now
+                stats = {stream.name: processor.frame_stats(camera)
+                         for camera, stream in enumerate(processor.streams)}
+                print(f"状态: {json.dumps(stats, ensure_ascii=False)} 事件: {writer.counts}", file=sys.stderr)
+                spans = processor.latency_report()['spans']
+                if spans:
+                    latency = ', '.join(f"{name} p50={s['p50_ms']:.0f}ms p95={s['p95_ms']:.0f}ms"
+                                        for name, s in spans.items())
+                    print(f"延迟: {latency}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for capture in captures:
+            capture.stop()
+        processor.stop()
+        writer.close()
+        if args.show:
+            cv2.destroyAllWindows()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _escape(value) -> str:
+    """标签值转义(Prometheus文本格式: 反斜杠、双引号、换行)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_str(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+class Metrics:
+    """
+    进程内指标: 计数器、直方图和回调式仪表
+    所有方法线程安全, 通过snapshot()在Python中读取, 或render()输出Prometheus文本格式
+    """
+    def __init__(self, prefix: str = 'intrusion'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._help = {}  # 指标名 -> (类型, 说明)
+        self._counters = {}  # (指标名, 标签) -> 值
+        self._histograms = {}  # (指标名, 标签) -> [各桶计数, 总和, 次数]
+        self._buckets = {}  # 指标名 -> 桶上界
+        self._gauges = {}  # 指标名 -> 回调, 返回数值或{标签元组: 数值}
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ('counter', help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self._help[name] = ('histogram', help_text)
+        self._buckets[name] = tuple(buckets)
+
+    def gauge(self, name: str, help_text: str, func: Callable[[], object]):
+        """
+        注册仪表, 读取时调用func
+        :param func: 返回数值, 或{(('标签', '值'), ...): 数值}
+        """
+        self._help[name] = ('gauge', help_text)
+        self._gauges[name] = func
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets[name]
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """计数器当前值"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def _gauge_values(self) -> Dict[str, dict]:
+        values = {}
+        for name, func in self._gauges.items():
+            try:
+                result = func()
+            except Exception:
+                continue
+            values[name] = result if isinstance(result, dict) else {(): result}
+        return values
+
+    def snapshot(self) -> dict:
+        """
+        当前所有指标
+        :return: {'counters': {名: {标签: 值}}, 'histograms': {名: {标签: {'count', 'sum', 'mean', 'buckets'}}},
+                  'gauges': {名: {标签: 值}}}, 标签为((键, 值), ...)元组
+        """
+        with self._lock:
+            counters, histograms = {}, {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, {})[labels] = value
+            for (name, labels), (counts, total, count) in self._histograms.items():
+                histograms.setdefault(name, {})[labels] = {
+                    'count': count,
+                    'sum': total,
+                    'mean': total / count if count else 0.0,
+                    'buckets': dict(zip(self._buckets[name] + (float('inf'),), counts)),
+                }
+        return {'counters': counters, 'histograms': histograms, 'gauges': self._gauge_values()}
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (kind, help_text) in self._help.items():
+            full = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {full} {help_text}')
+            lines.append(f'# TYPE {full} {kind}')
+            if kind == 'counter':
+                for labels, value in snapshot['counters'].get(name, {}).items():
+                    lines.append(f'{full}{_label_str(labels)} {value}')
+            elif kind == 'gauge':
+                for labels, value in snapshot['gauges'].get(name, {}).items():
+                    lines.append(f'{full}{_label_str(labels)} {value}')
+            else:
+                for labels, h in snapshot['histograms'].get(name, {}).items():
+                    cumulative = 0
+                    for bound, count in h['buckets'].items():
+                        cumulative += count
+                        le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                        lines.append(f'{full}_bucket{_label_str(labels, le)} {cumulative}')
+                    lines.append(f'{full}_sum{_label_str(labels)} {h["sum"]}')
+                    lines.append(f'{full}_count{_label_str(labels)} {h["count"]}')
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """在本地端口上提供/metrics(Prometheus文本格式)"""
+    def __init__(self, metrics: Metrics, port: int, host: str = '127.0.0.1'):
+        self.metrics = metrics
+        self.address = (host, port)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+import time
+from collections import deque
+from typing import List, Optional
+from detect_v1 import roi_mask
+
+class MotionGate:
+    """
+    运动门控: 只在监测区域内有变化时才运行YOLO
+    在缩小的灰度图上维护滑动平均背景, 计算区域内变化像素比例,
+    超过阈值或距上次推理超过保活间隔时放行
+    """
+    def __init__(self, regions: List[List[tuple]], threshold: float = 0.01,
+                 keepalive: float = 2.0, width: int = 160, alpha: float = 0.05,
+                 pixel_threshold: int = 25, history: int = 100):
+        """
+        :param regions: 监测区域列表(坐标比例), 多区域时取并集
+        :param threshold: 放行所需的区域内变化像素比例
+        :param keepalive: 保活推理间隔(秒), 静止画面也至少每隔这么久推理一次
+        :param width: 差分用缩略图宽度
+        :param alpha: 背景滑动平均系数
+        :param pixel_threshold: 灰度差超过该值的像素视为变化
+        :param history: 保留最近多少次判断记录
+        """
+        self.regions = regions
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.width = width
+        self.alpha = alpha
+        self.pixel_threshold = pixel_threshold
+        
+        self._background = None
+        self._mask = None
+        self._mask_area = 0
+        self.last_run_time = 0
+        
+        # 统计
+        self.checks = 0
+        self.motion_runs = 0
+        self.keepalive_runs = 0
+        self.skipped = 0
+        self.last_fraction = 0.0
+        self.decisions = deque(maxlen=history)  # (时间, 变化比例, 'init'/'motion'/'keepalive'/'skip')
+        
+    def _small_gray(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        height = max(1, int(round(h * self.width / w)))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+        
+    def _region_mask(self, shape: tuple) -> np.ndarray:
+        if self._mask is None or self._mask.shape != shape:
+            mask = np.zeros(shape, dtype=np.uint8)
+            for points in self.regions:
+                cv2.bitwise_or(mask, roi_mask(shape, points), dst=mask)
+            self._mask = mask
+            self._mask_area = max(1, cv2.countNonZero(mask))
+        return self._mask
+        
+    def reset(self):
+        """清空背景(例如区域或摄像头变化后)"""
+        self._background = None
+        self._mask = None
+        
+    def check(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """
+        判断当前帧是否需要运行YOLO
+        :param frame: 原始帧
+        :param now: 当前时间(time.monotonic()), 不传则取当前时间
+        :return: True=需要推理
+        """
+        if now is None:
+            now = time.monotonic()
+        self.checks += 1
+        gray = self._small_gray(frame)
+        
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            self.last_fraction = 1.0
+            return self._decide(now, 'init')
+        
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.alpha)
+        _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        cv2.bitwise_and(changed, self._region_mask(gray.shape), dst=changed)
+        self.last_fraction = cv2.countNonZero(changed) / self._mask_area
+        
+        if self.last_fraction >= self.threshold:
+            return self._decide(now, 'motion')
+        if now - self.last_run_time >= self.keepalive:
+            return self._decide(now, 'keepalive')
+        return self._decide(now, 'skip')
+        
+    def _decide(self, now: float, reason: str) -> bool:
+        self.decisions.append((now, self.last_fraction, reason))
+        if reason == 'skip':
+            self.skipped += 1
+            return False
+        if reason == 'keepalive':
+            self.keepalive_runs += 1
+        else:
+            self.motion_runs += 1
+        self.last_run_time = now
+        return True
+        
+    @property
+    def hit_rate(self) -> float:
+        """放行比例(推理次数 / 判断次数)"""
+        if self.checks == 0:
+            return 0.0
+        return (self.motion_runs + self.keepalive_runs) / self.checks
+        
+    def stats(self) -> dict:
+        """门控统计, 用于调阈值"""
+        return {
+            'checks': self.checks,
+            'motion_runs': self.motion_runs,
+            'keepalive_runs': self.keepalive_runs,
+            'skipped': self.skipped,
+            'hit_rate': self.hit_rate,
+            'last_fraction': self.last_fraction,
+        }
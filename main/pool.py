@@ -0,0 +1,342 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Callable, List, Optional
+import numpy as np
+from detect_v1 import model_init, model_prepare, prepare_input, postprocess
+from profiler import SamplingProfiler, add_forwarder, remove_forwarder
+from shm_ring import SharedFrameRing
+from tracing import LatencyTracer
+from v2 import CameraStream, Config, VideoProcessor
+
+def _worker_main(worker_id: int, task_queue, result_queue, shm_lock,
+                 model_path: str, backend: str, imgsz: int):
+    """
+    工作进程主函数: 加载一次模型, 循环完成掩码/推理/绘制/报警判断
+    任务: (摄像头序号, 帧序号, 采集时间戳, 帧或None, 输入缓冲spec, 输入槽位, 输出缓冲spec,
+           推理模式, 监测区域, 区域列表, 报警类别, 是否合成标注画面), 帧为None时从共享内存输入槽位读取;
+          ('profile', 时长, 间隔)为控制消息, 在本进程开始一次采样分析
+    结果: (工作进程序号, 摄像头序号, 帧序号, 采集时间戳, 标注后的帧或None, 输出槽位或None,
+           全部检测, 报警检测, 各区域报警, 耗时, 各阶段时间戳, 错误信息)
+    时间戳为time.monotonic(), 同一台机器上各进程可以直接比较
+    """
+    model = model_init(model_path, backend, imgsz)
+    rings = {}
+
+    def ring(spec: tuple) -> SharedFrameRing:
+        if spec[0] not in rings:
+            rings[spec[0]] = SharedFrameRing.attach(spec, shm_lock)
+        return rings[spec[0]]
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        if task[0] == 'profile':
+            SamplingProfiler(task[1], task[2], name=f'worker{worker_id}').start()
+            continue
+        (camera, seq, capture_time, frame, in_spec, in_slot, out_spec,
+         mode, mask_points, zones, alarm_classes, render) = task
+        start_time = time.monotonic()
+        timings = {'prepare': start_time}
+        annotated_frame, out_slot, detections, alarms, zone_alarms, error = None, None, [], [], {}, None
+        in_ring = ring(in_spec) if frame is None else None
+        out_ring = ring(out_spec) if out_spec is not None and render else None
+        try:
+            if in_ring is not None:
+                frame = in_ring.read(in_slot, seq)
+                if frame is None:
+                    raise RuntimeError(f"共享内存槽位{in_slot}已被复用")
+            # 标注画面直接合成到输出共享内存槽位, 只回传槽位号; 没有空闲槽位时退回pickle整帧
+            out = None
+            if out_ring is not None and out_ring.frame_shape == frame.shape:
+                out_slot = out_ring.acquire(seq)
+                if out_slot is not None:
+                    out = out_ring.view(out_slot)
+            model_input, masked_img, box = prepare_input(frame, mode, mask_points)
+            timings['infer_start'] = time.monotonic()
+            results = model(model_input, stream=False, save=False, imgsz=imgsz)
+            timings['infer_end'] = time.monotonic()
+            annotated_frame, detections, alarms, zone_alarms = postprocess(
+                results, frame, masked_img, box, alarm_classes, mode, zones, mask_points, out, render)
+            timings['postprocess_end'] = time.monotonic()
+            if out_slot is not None:
+                out_ring.commit(out_slot, capture_time)
+                annotated_frame = None
+        except Exception as e:
+            error = str(e)
+            if out_slot is not None:
+                out_ring.release(out_slot)
+                out_slot = None
+        finally:
+            if in_ring is not None:
+                in_ring.release(in_slot)
+
+        result_queue.put((worker_id, camera, seq, capture_time, annotated_frame, out_slot,
+                          detections, alarms, zone_alarms, time.monotonic() - start_time, timings, error))
+
+class ProcessPoolProcessor(VideoProcessor):
+    """
+    多进程视频处理器
+    采集交接、运动门控、频率调度和报警仍在主进程; 推理和绘制分发到工作进程池
+    (选择排队最少的进程), 结果按各路帧序号重新排序后再发布, 接口与VideoProcessor一致.
+    未送YOLO/光流传播的帧也排进同一个按序发布队列, 每路的跟踪和结果槽只按帧序号顺序、逐个更新.
+    Config.SHARED_MEMORY开启时, 各路的输入帧和标注结果经共享内存环形缓冲交换,
+    进程间只传槽位号
+    """
+    def __init__(self, cameras: Optional[List[dict]] = None, workers: int = Config.WORKERS,
+                 render: bool = True):
+        self.workers = workers
+        super().__init__(cameras, render)
+        self._context = mp.get_context('spawn')  # 避免fork带着推理库的线程状态
+        self._processes = []
+        self._task_queues = []
+        self._result_queue = None
+        self._in_flight = [0] * workers
+        self._next_worker = 0
+        self._lock = threading.Lock()
+        self._pending = [deque() for _ in self.streams]  # 各路待发布的(帧序号, 入队时间), 按帧序号顺序
+        self._done = [{} for _ in self.streams]  # 各路已就绪但还没轮到发布的帧: 帧序号 -> 发布函数
+        self._publish_locks = [threading.Lock() for _ in self.streams]  # 各路同一时间只有一个线程在发布
+        self._skipped = [set() for _ in self.streams]  # 各路超时被跳过的帧序号, 之后返回的结果直接丢弃
+        self._shm_lock = self._context.Lock()
+        self._rings = [None] * len(self.streams)  # 各路(输入缓冲, 输出缓冲), 首帧到达时按帧尺寸创建
+        self.metrics.gauge('workers_in_flight', '各工作进程排队中的帧数',
+                           lambda: {(('worker', str(worker)),): n for worker, n in enumerate(self._in_flight)})
+
+    def _load_model(self):
+        """模型在各工作进程中加载"""
+        return None
+
+    def start(self):
+        """启动工作进程、结果收集线程和分发线程"""
+        model_prepare(Config.MODEL_PATH, Config.BACKEND, Config.IMGSZ)
+        self._result_queue = self._context.Queue()
+        for worker_id in range(self.workers):
+            task_queue = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(worker_id, task_queue, self._result_queue, self._shm_lock,
+                      Config.MODEL_PATH, Config.BACKEND, Config.IMGSZ))
+            process.daemon = True
+            process.start()
+            self._task_queues.append(task_queue)
+            self._processes.append(process)
+
+        super().start()
+        add_forwarder(self._forward_profiling)
+        self.collector_thread = threading.Thread(target=self._collect_results, name='pool-results')
+        self.collector_thread.daemon = True
+        self.collector_thread.start()
+
+    def stop(self):
+        """先停止结果收集(不再发布结果), 再停止分发和各项服务, 最后关闭工作进程"""
+        remove_forwarder(self._forward_profiling)
+        self.running = False
+        self.collector_thread.join()
+        super().stop()
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._task_queues = []
+        for camera, rings in enumerate(self._rings):
+            if rings is not None:
+                for ring in rings:
+                    ring.close()
+                self._rings[camera] = None
+
+    def _forward_profiling(self, duration: float, interval: float):
+        """开始采样分析时通知各工作进程也采样(推理/绘制在工作进程中)"""
+        for task_queue in self._task_queues:
+            task_queue.put(('profile', duration, interval))
+
+    def ring_stats(self) -> dict:
+        """各路共享内存缓冲的槽位占用统计"""
+        stats = {}
+        for stream, rings in zip(self.streams, self._rings):
+            if rings is not None:
+                stats[stream.name] = {'input': rings[0].stats(), 'output': rings[1].stats()}
+        return stats
+
+    def _get_rings(self, camera: int, frame) -> Optional[tuple]:
+        """获取该路的共享内存缓冲, 首帧到达时按帧尺寸创建"""
+        if not Config.SHARED_MEMORY:
+            return None
+        if self._rings[camera] is None:
+            slots = self.workers * Config.MAX_IN_FLIGHT + 2
+            self._rings[camera] = (
+                SharedFrameRing(slots, frame.shape, self._shm_lock, frame.dtype),
+                SharedFrameRing(slots, frame.shape, self._shm_lock, frame.dtype),
+            )
+        return self._rings[camera]
+
+    def worker_stats(self) -> dict:
+        """各工作进程当前排队帧数和存活状态"""
+        with self._lock:
+            in_flight = list(self._in_flight)
+        return {
+            'in_flight': in_flight,
+            'alive': [process.is_alive() for process in self._processes],
+        }
+
+    def _pick_worker(self) -> Optional[int]:
+        """选择排队最少的存活进程(并列时轮询), 都满了返回None"""
+        best = None
+        for offset in range(self.workers):
+            worker = (self._next_worker + offset) % self.workers
+            if not self._processes[worker].is_alive():
+                continue
+            if self._in_flight[worker] >= Config.MAX_IN_FLIGHT:
+                continue
+            if best is None or self._in_flight[worker] < self._in_flight[best]:
+                best = worker
+        if best is not None:
+            self._next_worker = (best + 1) % self.workers
+        return best
+
+    def _collect_batch(self) -> List[tuple]:
+        # 所有工作进程都满时不取帧, 让交接槽里的帧继续被新帧覆盖
+        with self._lock:
+            full = all(n >= Config.MAX_IN_FLIGHT for n in self._in_flight)
+        if full:
+            return []
+        return super()._collect_batch()
+
+    def _process_batch(self, batch: List[tuple]):
+        """把各路帧分发到工作进程(不在本线程推理)"""
+        for stream, (seq, capture_time, frame) in batch:
+            camera = self.streams.index(stream)
+            with self._lock:
+                worker = self._pick_worker()
+                if worker is not None:
+                    self._in_flight[worker] += 1
+                    self._pending[camera].append((seq, time.monotonic()))
+            # 所有进程都满(或都已退出)时丢弃该帧(不单独发布, 以免越过还在处理中的旧帧)
+            if worker is None:
+                stream.traces.pop(seq, None)
+                self.metrics.inc('frames_dropped_total', camera=stream.name)
+                continue
+            LatencyTracer.mark(stream.traces.get(seq), 'dispatch', time.monotonic())
+            
+            # 优先经共享内存传帧; 缓冲已满或帧尺寸变化时退回pickle整帧
+            in_spec = out_spec = in_slot = None
+            rings = self._get_rings(camera, frame)
+            if rings is not None:
+                in_slot = rings[0].write(frame, seq, capture_time)
+                if in_slot is not None:
+                    in_spec, out_spec = rings[0].spec(), rings[1].spec()
+                    frame = None
+            self._task_queues[worker].put((camera, seq, capture_time, frame, in_spec, in_slot, out_spec,
+                                           stream.mode, stream.mask_points, stream.zones,
+                                           list(stream.alarm_classes), self.render))
+
+    def _collect_results(self):
+        """结果收集线程: 按帧序号重排后发布"""
+        while self.running:
+            try:
+                message = self._result_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            worker, camera, seq, out_slot = message[0], message[1], message[2], message[5]
+            with self._lock:
+                self._in_flight[worker] -= 1
+                late = seq in self._skipped[camera]
+                if late:
+                    # 超时后才返回的结果: 不再发布, 归还输出槽位
+                    self._skipped[camera].discard(seq)
+                    if out_slot is not None:
+                        self._rings[camera][1].release(out_slot)
+                else:
+                    self._done[camera][seq] = partial(self._publish_message, message)
+            # 有进程空出来了, 唤醒分发线程
+            self._frame_event.set()
+            if not late:
+                self._publish_ready(camera)
+
+    def _publish_gated(self, stream: CameraStream, item: tuple, reason: str):
+        """未送YOLO的帧按序发布"""
+        self._defer(stream, item[0], partial(super()._publish_gated, stream, item, reason))
+
+    def _publish_propagated(self, stream: CameraStream, item: tuple, detections: np.ndarray):
+        """光流传播的帧按序发布"""
+        self._defer(stream, item[0], partial(super()._publish_propagated, stream, item, detections))
+
+    def _defer(self, stream: CameraStream, seq: int, publish: Callable[[], None]):
+        """处理线程中就绪的帧(未送YOLO/光流传播): 排在该路还在推理中的旧帧之后发布"""
+        camera = self.streams.index(stream)
+        with self._lock:
+            self._pending[camera].append((seq, time.monotonic()))
+            self._done[camera][seq] = publish
+        self._publish_ready(camera)
+
+    def _publish_ready(self, camera: int):
+        """按帧序号发布该路已就绪的帧; 取出和发布都在该路的发布锁内, 两个线程不会交错或乱序"""
+        with self._publish_locks[camera]:
+            with self._lock:
+                ready = self._pop_ready(camera)
+            # 单帧出错只记录, 不能让收集线程退出(否则排队计数不再减少, 分发停住)
+            for publish in ready:
+                try:
+                    publish()
+                except Exception as e:
+                    self.metrics.inc('errors_total')
+                    print(f"发布结果时出错: {e}")
+
+    def _publish_message(self, message: tuple):
+        """发布一个工作进程结果, 输出槽位无论成败都会归还"""
+        (_, camera, seq, capture_time, annotated_frame, out_slot,
+         detections, alarms, zone_alarms, latency, timings, error) = message
+        stream = self.streams[camera]
+        if out_slot is not None:
+            annotated_frame = self._take_output(camera, out_slot)
+        if error is not None:
+            stream.traces.pop(seq, None)
+            self.metrics.inc('errors_total')
+            print(f"处理帧时出错: {error}")
+            return
+        self.metrics.observe('stage_seconds', latency, stage='worker')
+        trace = stream.traces.get(seq)
+        if trace is not None:
+            trace.update(timings)
+            self.metrics.observe('latency_seconds', timings['infer_end'] - capture_time,
+                                 camera=stream.name, span='inference')
+        self._publish_result(stream, seq, capture_time,
+                             annotated_frame, detections, alarms, zone_alarms)
+        if self.scheduler is not None:
+            # 多个进程并行, 按均摊到单路的耗时计入预算
+            self.scheduler.record(latency / self.workers, time.monotonic() - capture_time)
+
+    def _take_output(self, camera: int, out_slot: int):
+        """从输出槽位拷出标注画面并立即归还槽位(显示端持有的画面不会被工作进程覆盖)"""
+        out_ring = self._rings[camera][1]
+        try:
+            return out_ring.view(out_slot).copy()
+        finally:
+            out_ring.release(out_slot)
+
+    def _pop_ready(self, camera: int) -> list:
+        """取出该路按序可发布的帧(发布函数列表); 队首超时未返回(进程异常)时跳过它"""
+        pending = self._pending[camera]
+        done = self._done[camera]
+        ready = []
+        now = time.monotonic()
+        while pending:
+            seq, dispatch_time = pending[0]
+            if seq in done:
+                ready.append(done.pop(seq))
+                pending.popleft()
+            elif done and now - dispatch_time > 1.0:
+                pending.popleft()
+                self._skipped[camera].add(seq)
+                self.streams[camera].traces.pop(seq, None)
+            else:
+                break
+        return ready
@@ -0,0 +1,168 @@
+"""
+运行中按需采样分析
+在检测程序运行时开启一段限时的采样: 定时读取所有线程(采集/处理/GUI等)的调用栈,
+按流水线阶段打标签, 输出火焰图工具可直接使用的折叠栈文件(flamegraph.pl / speedscope).
+未开启时没有任何额外开销: 阶段由调用栈中的函数名推断, 检测代码里不需要埋点.
+多进程模式(EXECUTION='process')下采样同时转发给各工作进程, 每个进程各写一个文件(文件名带worker序号).
+
+触发方式:
+    - 信号: kill -USR1 <pid> (程序中调用过install_signal_handler)
+    - 命令行: python profiler.py <pid> (发送同一个信号)
+    - 界面: DetectionApp中按Ctrl+Shift+P
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Optional
+
+# (文件名, 函数名) -> 流水线阶段, 取调用栈中最内层匹配的函数
+STAGE_FUNCTIONS = {
+    ('v2.py', '_capture_frames'): 'capture',
+    ('v2.py', '_process_frames'): 'wait',
+    ('v2.py', '_collect_batch'): 'collect',
+    ('pool.py', '_collect_batch'): 'collect',
+    ('motion_gate.py', 'check'): 'motion_gate',
+    ('propagate.py', 'step'): 'propagate',
+    ('propagate.py', 'seed'): 'propagate',
+    ('v2.py', '_publish_propagated'): 'propagate',
+    ('v2.py', '_publish_gated'): 'gated',
+    ('v2.py', '_process_batch'): 'inference',
+    ('pool.py', '_process_batch'): 'dispatch',
+    ('detect_v1.py', 'prepare_input'): 'prepare',
+    ('detect_v1.py', 'postprocess'): 'postprocess',
+    ('v2.py', '_publish_result'): 'publish',
+    ('pool.py', '_collect_results'): 'collect_results',
+    ('pool.py', '_worker_main'): 'worker',
+    ('v3.py', 'update_frame'): 'gui',
+    ('v4.py', 'update_frame'): 'gui',
+}
+
+class SamplingProfiler:
+    """
+    采样分析器
+    独立线程每隔interval秒读取sys._current_frames(), 折叠为"线程;阶段;函数;..."计数,
+    duration秒后自动停止并写文件
+    """
+    def __init__(self, duration: float = 30.0, interval: float = 0.005,
+                 output_dir: str = os.path.join('save', 'profiles'), name: str = 'profile'):
+        """
+        :param duration: 采样时长(秒)
+        :param interval: 采样间隔(秒)
+        :param output_dir: 输出目录
+        :param name: 输出文件名前缀(多个进程同时采样时区分文件)
+        """
+        self.duration = duration
+        self.interval = interval
+        self.output_dir = output_dir
+        self.name = name
+        self.stacks = Counter()
+        self.stages = Counter()
+        self.samples = 0
+        self.output = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """提前结束(同样会写文件)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @staticmethod
+    def _fold(frame) -> tuple:
+        """调用栈 -> (阶段, 从外到内的函数列表)"""
+        names = []
+        stage = None
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            names.append(f'{code.co_name} ({filename})')
+            if stage is None:
+                stage = STAGE_FUNCTIONS.get((filename, code.co_name))
+            frame = frame.f_back
+        names.reverse()
+        return stage or 'other', names
+
+    def _run(self):
+        own = threading.get_ident()
+        end = time.monotonic() + self.duration
+        while not self._stop.is_set() and time.monotonic() < end:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stage, names = self._fold(frame)
+                thread_name = thread_names.get(ident, str(ident)).replace(';', '_')
+                self.stacks[';'.join([thread_name, f'[{stage}]'] + names)] += 1
+                self.stages[stage] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        self._write()
+
+    def _write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.output = os.path.join(self.output_dir, time.strftime(f'{self.name}_%Y%m%d_%H%M%S.folded'))
+        with open(self.output, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        total = sum(self.stages.values()) or 1
+        summary = ', '.join(f'{stage} {count * 100 / total:.1f}%' for stage, count in self.stages.most_common())
+        print(f"采样分析完成({self.samples}次): {self.output}\n各阶段占比: {summary}")
+
+_profiler: Optional[SamplingProfiler] = None
+_forwarders: List[Callable[[float, float], None]] = []  # 开始采样时一并通知的回调(例如转发给工作进程)
+
+def add_forwarder(callback: Callable[[float, float], None]):
+    """注册开始采样时的回调callback(duration, interval)"""
+    _forwarders.append(callback)
+
+def remove_forwarder(callback: Callable[[float, float], None]):
+    if callback in _forwarders:
+        _forwarders.remove(callback)
+
+def start_profiling(duration: float = 30.0, interval: float = 0.005) -> Optional[SamplingProfiler]:
+    """开始一次限时采样(并通知已注册的转发回调), 已在采样中时返回None"""
+    global _profiler
+    if _profiler is not None and _profiler.running:
+        return None
+    _profiler = SamplingProfiler(duration, interval)
+    _profiler.start()
+    for forward in list(_forwarders):
+        try:
+            forward(duration, interval)
+        except Exception as e:
+            print(f"转发采样请求失败: {e}")
+    print(f"开始采样分析, 持续{duration:.0f}秒")
+    return _profiler
+
+def install_signal_handler(duration: float = 30.0):
+    """收到SIGUSR1时开始采样(需在主线程调用, Windows上不可用)"""
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    signal.signal(signal.SIGUSR1, lambda signum, frame: start_profiling(duration))
+
+def main():
+    parser = argparse.ArgumentParser(description="通知运行中的检测程序开始采样分析")
+    parser.add_argument('pid', type=int, help="检测程序的进程号")
+    args = parser.parse_args()
+    os.kill(args.pid, signal.SIGUSR1)
+    print(f"已发送SIGUSR1到进程{args.pid}, 结果写在该进程工作目录的save/profiles下")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import threading
+import cv2
+import numpy as np
+from collections import deque
+from typing import Optional
+
+class BoxPropagator:
+    """
+    关键帧检测 + 光流传播
+    每隔interval帧(或按需)运行一次YOLO, 中间帧在缩小的灰度图上用稀疏光流(LK)
+    跟踪各检测框内的角点, 按角点的中位位移/缩放平移检测框.
+    某个框能跟上的角点比例过低时判定传播失效, 下一帧强制重新检测.
+    多进程模式下step(处理线程)和seed(结果收集线程)在不同线程调用, 内部加锁
+    """
+    def __init__(self, interval: int = 5, width: int = 320, max_corners: int = 20,
+                 min_ratio: float = 0.5, max_error: float = 1.0, history: int = 16):
+        """
+        :param interval: 关键帧间隔(帧), 每interval帧至少检测一次
+        :param width: 光流计算用缩略图宽度
+        :param max_corners: 每个检测框最多跟踪的角点数
+        :param min_ratio: 框内角点跟踪成功比例低于该值时强制重新检测
+        :param max_error: 前后向光流误差上限(缩略图像素), 超过的角点视为跟踪失败
+        :param history: 保留最近多少帧缩略图(多进程模式下关键帧结果可能晚几帧返回)
+        """
+        self.interval = interval
+        self.width = width
+        self.max_corners = max_corners
+        self.min_ratio = min_ratio
+        self.max_error = max_error
+
+        self._grays = deque(maxlen=history)  # (帧序号, 缩略灰度图)
+        self._scale = 1.0  # 原图 -> 缩略图
+        self._prev_gray = None
+        self._points = []  # 每个框的角点(缩略图坐标, (K, 1, 2) float32)
+        self._detections = None  # 最近一次检测/传播的结果(原图坐标)
+        self._since_key = 0
+        self._lock = threading.Lock()
+        self.force = False  # 按需检测: 置为True时下一帧运行YOLO
+
+        # 统计
+        self.keyframes = 0
+        self.propagated = 0
+        self.lost = 0
+
+    def reset(self):
+        with self._lock:
+            self._grays.clear()
+            self._prev_gray = None
+            self._points = []
+            self._detections = None
+
+    def _small_gray(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        self._scale = self.width / w
+        height = max(1, int(round(h * self._scale)))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def step(self, seq: int, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        处理一帧
+        :param seq: 帧序号
+        :param frame: 原始帧
+        :return: 传播得到的检测(ALARM_DTYPE), 需要运行YOLO(关键帧/传播失效)时返回None
+        """
+        with self._lock:
+            gray = self._small_gray(frame)
+            self._grays.append((seq, gray))
+
+            if self.force or self._detections is None or self._since_key >= self.interval - 1:
+                self.force = False
+                self._since_key = 0
+                self.keyframes += 1
+                return None
+
+            detections = self._propagate(gray)
+            if detections is None:
+                self.lost += 1
+                self._detections = None
+                self.keyframes += 1
+                return None
+            self._since_key += 1
+            self.propagated += 1
+            return detections
+
+    def seed(self, seq: int, detections: np.ndarray):
+        """
+        用关键帧的检测结果重新选取角点
+        :param seq: 关键帧序号
+        :param detections: 关键帧的检测(ALARM_DTYPE)
+        """
+        with self._lock:
+            gray = next((g for s, g in reversed(self._grays) if s == seq), None)
+            if gray is None:
+                return
+            self._prev_gray = gray
+            self._detections = detections.copy()
+            self._points = []
+            h, w = gray.shape
+            for x1, y1, x2, y2 in (detections['xyxy'] * self._scale).astype(np.int32).tolist():
+                # 只在框内部取角点, 避开边缘处的背景
+                mx, my = (x2 - x1) // 6, (y2 - y1) // 6
+                mask = np.zeros_like(gray)
+                mask[max(0, y1 + my):min(h, y2 - my), max(0, x1 + mx):min(w, x2 - mx)] = 255
+                points = cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 3, mask=mask)
+                self._points.append(points if points is not None else np.empty((0, 1, 2), np.float32))
+
+    def _propagate(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """从上一帧光流传播检测框, 任一框跟踪失效时返回None"""
+        if len(self._detections) == 0:
+            self._prev_gray = gray
+            return self._detections.copy()
+        if any(len(points) < 3 for points in self._points):
+            return None
+
+        counts = [len(points) for points in self._points]
+        prev_points = np.concatenate(self._points)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, prev_points, None,
+                                                          winSize=(15, 15), maxLevel=2)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, next_points, None,
+                                                               winSize=(15, 15), maxLevel=2)
+        error = np.linalg.norm((prev_points - back_points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < self.max_error)
+
+        detections = self._detections.copy()
+        new_points = []
+        start = 0
+        for i, count in enumerate(counts):
+            index = slice(start, start + count)
+            start += count
+            ok = good[index]
+            ratio = ok.mean()
+            if ratio < self.min_ratio or ok.sum() < 3:
+                return None
+            p0 = prev_points[index][ok].reshape(-1, 2)
+            p1 = next_points[index][ok].reshape(-1, 2)
+
+            # 中位位移 + 角点间距离比的中位数作为缩放
+            dx, dy = np.median(p1 - p0, axis=0) / self._scale
+            d0 = np.linalg.norm(p0[:, None] - p0[None], axis=2)
+            d1 = np.linalg.norm(p1[:, None] - p1[None], axis=2)
+            valid = d0 > 1
+            scale = float(np.median(d1[valid] / d0[valid])) if valid.any() else 1.0
+
+            x1, y1, x2, y2 = detections['xyxy'][i]
+            cx, cy = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+            hw, hh = (x2 - x1) / 2 * scale, (y2 - y1) / 2 * scale
+            detections['xyxy'][i] = (cx - hw, cy - hh, cx + hw, cy + hh)
+            detections['confidence'][i] *= ratio
+            new_points.append(p1.reshape(-1, 1, 2).astype(np.float32))
+
+        h, w = gray.shape
+        np.clip(detections['xyxy'], 0, [w / self._scale, h / self._scale] * 2, out=detections['xyxy'])
+        self._prev_gray = gray
+        self._points = new_points
+        self._detections = detections
+        return detections.copy()
+
+    def stats(self) -> dict:
+        total = self.keyframes + self.propagated
+        return {
+            'keyframes': self.keyframes,
+            'propagated': self.propagated,
+            'lost': self.lost,
+            'detect_ratio': self.keyframes / total if total else 0.0,
+        }
@@ -0,0 +1,246 @@
+"""
+INT8训练后量化工具
+用自己摄像头/录像中采样的画面(按监测区域处理后)做校准, 把检测模型量化为INT8 ONNX,
+并报告与FP32模型的检测一致性(以FP32结果为基准的mAP50/精确率/召回率)和推理耗时.
+生成的模型放在导出缓存目录, 将Config.BACKEND设为'onnx_int8'即可通过model_init加载.
+
+用法:
+    python quantize.py --source 0 --source record/cam1.mp4 --frames 200
+"""
+import argparse
+import json
+import os
+import time
+from typing import List
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from backends import export_model, int8_path
+from detect_v1 import prepare_input
+from v2 import Config
+
+def sample_frames(sources: List[str], frames: int, stride: int) -> List[np.ndarray]:
+    """
+    从摄像头/视频中采样画面, 并按当前推理模式处理成模型实际看到的输入
+    :param sources: 摄像头序号或视频路径
+    :param frames: 每路采样帧数
+    :param stride: 采样间隔(帧)
+    :return: 模型输入图像列表
+    """
+    samples = []
+    for source in sources:
+        cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        if not cap.isOpened():
+            print(f"无法打开: {source}")
+            continue
+        count = 0
+        index = 0
+        while count < frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % stride == 0:
+                model_input, _, _ = prepare_input(frame, Config.INFER_MODE, Config.MASK_POINTS)
+                samples.append(np.ascontiguousarray(model_input))
+                count += 1
+            index += 1
+        cap.release()
+        print(f"{source}: 采样 {count} 帧")
+    return samples
+
+def letterbox(img: np.ndarray, size: int) -> np.ndarray:
+    """与ultralytics一致的等比缩放+灰边填充"""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    resized = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out[top:top + nh, left:left + nw] = resized
+    return out
+
+def to_tensor(img: np.ndarray, size: int) -> np.ndarray:
+    """BGR图像 -> (1, 3, size, size) float32 [0, 1]"""
+    img = letterbox(img, size)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(img, dtype=np.float32)[None] / 255.0
+
+def quantize(fp32_path: str, int8_out: str, samples: List[np.ndarray], imgsz: int, quantize_head: bool):
+    """
+    ONNX Runtime静态量化(QDQ, 权重按通道INT8)
+    :param quantize_head: 是否量化检测头(默认检测头保留FP32, 精度损失更小)
+    """
+    import onnx
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat,
+                                          QuantType, quantize_static)
+
+    input_name = InferenceSession(fp32_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._iter = iter(samples)
+
+        def get_next(self):
+            img = next(self._iter, None)
+            return None if img is None else {input_name: to_tensor(img, imgsz)}
+
+    # YOLOv8检测头(model.22)对量化敏感, 默认保留FP32
+    exclude = []
+    if not quantize_head:
+        exclude = [node.name for node in onnx.load(fp32_path).graph.node if '/model.22/' in node.name]
+
+    quantize_static(fp32_path, int8_out, FrameReader(),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                    nodes_to_exclude=exclude)
+
+def predict(model: YOLO, img: np.ndarray, imgsz: int) -> tuple:
+    """返回(xyxy, cls, conf) numpy数组"""
+    boxes = model(img, stream=False, save=False, imgsz=imgsz, verbose=False)[0].boxes
+    return boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy().astype(int), boxes.conf.cpu().numpy()
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, 4) x (M, 4) -> (N, M) IoU"""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def match(ref: tuple, test: tuple, iou_thres: float = 0.5) -> np.ndarray:
+    """
+    按置信度从高到低把test检测贪心匹配到ref检测(同类别且IoU达标)
+    :return: test中每个检测是否匹配成功
+    """
+    ref_xyxy, ref_cls, _ = ref
+    xyxy, cls, conf = test
+    matched = np.zeros(len(cls), dtype=bool)
+    if len(cls) == 0 or len(ref_cls) == 0:
+        return matched
+    iou = box_iou(xyxy, ref_xyxy)
+    iou[cls[:, None] != ref_cls[None, :]] = 0
+    used = np.zeros(len(ref_cls), dtype=bool)
+    for i in np.argsort(-conf):
+        candidates = np.where(~used & (iou[i] >= iou_thres))[0]
+        if len(candidates):
+            j = candidates[np.argmax(iou[i, candidates])]
+            used[j] = True
+            matched[i] = True
+    return matched
+
+def average_precision(tp: np.ndarray, conf: np.ndarray, n_ref: int) -> float:
+    """全点插值AP"""
+    if n_ref == 0:
+        return float('nan')
+    if len(tp) == 0:
+        return 0.0
+    order = np.argsort(-conf)
+    tp = tp[order]
+    tp_cum = np.cumsum(tp)
+    recall = tp_cum / n_ref
+    precision = tp_cum / np.arange(1, len(tp) + 1)
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+def evaluate(fp32: YOLO, int8: YOLO, samples: List[np.ndarray], imgsz: int) -> dict:
+    """
+    以FP32检测结果为基准评估INT8模型, 同时测量两者推理耗时
+    :return: 报告字典
+    """
+    # 预热
+    for model in (fp32, int8):
+        for img in samples[:3]:
+            predict(model, img, imgsz)
+
+    latency = {'fp32': [], 'int8': []}
+    per_class = {}  # 类别 -> [tp列表, conf列表, 基准数量]
+    n_ref = n_test = n_matched = 0
+    for img in samples:
+        start = time.perf_counter()
+        ref = predict(fp32, img, imgsz)
+        latency['fp32'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        test = predict(int8, img, imgsz)
+        latency['int8'].append(time.perf_counter() - start)
+
+        matched = match(ref, test)
+        n_ref += len(ref[1])
+        n_test += len(test[1])
+        n_matched += int(matched.sum())
+        for c in set(ref[1].tolist()) | set(test[1].tolist()):
+            entry = per_class.setdefault(c, [[], [], 0])
+            entry[0].extend(matched[test[1] == c].tolist())
+            entry[1].extend(test[2][test[1] == c].tolist())
+            entry[2] += int((ref[1] == c).sum())
+
+    aps = [average_precision(np.array(tp, dtype=bool), np.array(conf), n) for tp, conf, n in per_class.values()]
+    aps = [ap for ap in aps if not np.isnan(ap)]
+    precision = n_matched / n_test if n_test else 1.0
+    recall = n_matched / n_ref if n_ref else 1.0
+
+    def summary(values):
+        ms = np.array(values) * 1000
+        return {'mean_ms': float(ms.mean()), 'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95))}
+
+    report = {
+        'frames': len(samples),
+        'map50_vs_fp32': float(np.mean(aps)) if aps else float('nan'),
+        'precision_vs_fp32': precision,
+        'recall_vs_fp32': recall,
+        'f1_vs_fp32': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'fp32_detections': n_ref,
+        'int8_detections': n_test,
+        'latency_fp32': summary(latency['fp32']),
+        'latency_int8': summary(latency['int8']),
+    }
+    report['speedup'] = report['latency_fp32']['mean_ms'] / report['latency_int8']['mean_ms']
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="用自有画面做INT8训练后量化")
+    parser.add_argument('--source', action='append', required=True,
+                        help="摄像头序号或视频文件, 可重复指定")
+    parser.add_argument('--model', default=Config.MODEL_PATH, help="FP32 .pt权重")
+    parser.add_argument('--imgsz', type=int, default=Config.IMGSZ)
+    parser.add_argument('--frames', type=int, default=200, help="每路采样帧数")
+    parser.add_argument('--stride', type=int, default=15, help="采样间隔(帧)")
+    parser.add_argument('--eval-ratio', type=float, default=0.2, help="留作评估的采样比例")
+    parser.add_argument('--cache-dir', default=os.path.join('save', 'export_cache'))
+    parser.add_argument('--quantize-head', action='store_true', help="同时量化检测头")
+    parser.add_argument('--dynamic', action='store_true', help="动态shape(多路batch推理时使用)")
+    parser.add_argument('--report', default=None, help="报告JSON输出路径")
+    args = parser.parse_args()
+
+    samples = sample_frames(args.source, args.frames, args.stride)
+    if len(samples) < 2:
+        print("采样帧不足, 无法量化")
+        return
+
+    # 交错划分校准集和评估集, 两者都覆盖所有摄像头
+    every = max(2, int(round(1 / args.eval_ratio))) if args.eval_ratio > 0 else len(samples) + 1
+    calib = [img for i, img in enumerate(samples) if i % every != 0]
+    evals = [img for i, img in enumerate(samples) if i % every == 0]
+
+    fp32_path = export_model(args.model, 'onnx', args.imgsz, args.dynamic, args.cache_dir)
+    int8_out = int8_path(args.model, args.imgsz, args.dynamic, args.cache_dir)
+    print(f"校准 {len(calib)} 帧, 量化: {fp32_path} -> {int8_out}")
+    quantize(fp32_path, int8_out, calib, args.imgsz, args.quantize_head)
+
+    report = evaluate(YOLO(fp32_path, task='detect'), YOLO(int8_out, task='detect'), evals, args.imgsz)
+    report['fp32_model'] = fp32_path
+    report['int8_model'] = int8_out
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    report_path = args.report or int8_out[:-len('.onnx')] + '_report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已保存: {report_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import time
+from collections import deque
+from typing import Optional
+
+class InferenceScheduler:
+    """
+    自适应推理频率调度
+    用滑动窗口统计实测推理耗时, 按CPU预算(推理时间占比)算出每路的最小推理间隔;
+    端到端延迟超出预算时进一步放慢, 报警或检测到运动后短时间内恢复全速
+    """
+    def __init__(self, budget: float = 0.5, latency_budget: float = 0.5,
+                 max_fps: float = 30, min_fps: float = 1, window: int = 30,
+                 boost_time: float = 3.0):
+        """
+        :param budget: 推理时间占墙钟时间的比例上限(0~1]
+        :param latency_budget: 采集到出结果的延迟上限(秒)
+        :param max_fps: 每路最高检测频率
+        :param min_fps: 每路最低检测频率
+        :param window: 推理耗时滑动窗口长度
+        :param boost_time: 报警/运动后全速检测的持续时间(秒)
+        """
+        self.budget = budget
+        self.latency_budget = latency_budget
+        self.min_interval = 1.0 / max_fps
+        self.max_interval = 1.0 / min_fps
+        self.boost_time = boost_time
+        self.latencies = deque(maxlen=window)
+        self.backoff = 1.0  # 延迟超预算时的额外放慢倍数
+        self._next_time = {}  # 各路下次允许推理的时间
+        self._boost_until = {}  # 各路全速检测截止时间
+        
+    @property
+    def mean_latency(self) -> float:
+        """窗口内平均推理耗时(秒)"""
+        if not self.latencies:
+            return 0.0
+        return sum(self.latencies) / len(self.latencies)
+        
+    def interval(self, key, now: Optional[float] = None) -> float:
+        """指定路当前的推理间隔(秒)"""
+        if now is None:
+            now = time.monotonic()
+        if now < self._boost_until.get(key, 0):
+            return self.min_interval
+        interval = self.mean_latency / self.budget * self.backoff
+        return min(self.max_interval, max(self.min_interval, interval))
+        
+    def should_run(self, key, now: Optional[float] = None) -> bool:
+        """
+        判断指定路本帧是否推理, 放行时同时预约下一次推理时间
+        :param key: 摄像头标识
+        :param now: 当前时间(time.monotonic())
+        """
+        if now is None:
+            now = time.monotonic()
+        if now < self._next_time.get(key, 0):
+            return False
+        self._next_time[key] = now + self.interval(key, now)
+        return True
+        
+    def boost(self, key, now: Optional[float] = None):
+        """报警或检测到运动后, 指定路在boost_time内恢复全速检测"""
+        if now is None:
+            now = time.monotonic()
+        self._boost_until[key] = now + self.boost_time
+        self._next_time[key] = min(self._next_time.get(key, 0), now + self.min_interval)
+        
+    def record(self, latency: float, age: Optional[float] = None):
+        """
+        记录一次推理的实测耗时
+        :param latency: 推理(含前后处理)耗时(秒)
+        :param age: 该批结果的采集到出结果延迟(秒)
+        """
+        self.latencies.append(latency)
+        if age is None:
+            return
+        if age > self.latency_budget:
+            self.backoff = min(self.backoff * 1.5, self.max_interval / self.min_interval)
+        else:
+            self.backoff = max(1.0, self.backoff * 0.9)
+            
+    def stats(self) -> dict:
+        return {
+            'mean_latency': self.mean_latency,
+            'backoff': self.backoff,
+            'intervals': {key: self.interval(key) for key in self._next_time},
+        }
@@ -0,0 +1,163 @@
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+class SharedFrameRing:
+    """
+    基于共享内存的固定槽位帧环形缓冲
+    各槽位带帧序号、时间戳和状态, 生产者和消费者可以在不同进程中直接读写同一块内存,
+    进程间只需传递(槽位, 帧序号), 不再pickle整帧.
+    内存布局: [状态/帧序号 int64 x 2 x slots][时间戳 float64 x slots][帧数据 x slots]
+    """
+    FREE, WRITING, READY, READING = 0, 1, 2, 3
+
+    def __init__(self, slots: int, frame_shape: Tuple[int, ...], lock, dtype=np.uint8,
+                 name: Optional[str] = None):
+        """
+        :param slots: 槽位数
+        :param frame_shape: 帧尺寸, 例如(480, 680, 3)
+        :param lock: 跨进程锁(multiprocessing.Lock), 保护槽位状态
+        :param dtype: 帧数据类型
+        :param name: 共享内存名, 为None时新建, 否则按名字连接已有的缓冲
+        """
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.lock = lock
+        self.frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+
+        meta_bytes = slots * 2 * 8
+        times_bytes = slots * 8
+        size = meta_bytes + times_bytes + slots * self.frame_bytes
+        self.owner = name is None
+        if not self.owner and sys.version_info >= (3, 13):
+            # 连接方不负责回收, 不登记到resource_tracker
+            self.shm = shared_memory.SharedMemory(name=name, create=False, size=size, track=False)
+        else:
+            # 旧版本连接时也会登记, 但spawn出的工作进程与创建者共用同一个resource_tracker,
+            # 重复登记无害; 不能在这里unregister, 否则会连创建者的登记一起删掉
+            self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+
+        self._meta = np.ndarray((slots, 2), dtype=np.int64, buffer=self.shm.buf)  # [状态, 帧序号]
+        self._times = np.ndarray((slots,), dtype=np.float64, buffer=self.shm.buf, offset=meta_bytes)
+        self._frames = np.ndarray((slots,) + self.frame_shape, dtype=self.dtype,
+                                  buffer=self.shm.buf, offset=meta_bytes + times_bytes)
+        if self.owner:
+            self._meta[:] = 0
+            self._times[:] = 0
+
+        # 本进程内的统计
+        self.writes = 0
+        self.full_count = 0  # 没有空闲槽位导致写入失败的次数
+        self.peak_occupied = 0
+        self._next = 0
+
+    def spec(self) -> tuple:
+        """用于在其它进程中连接本缓冲的参数"""
+        return (self.name, self.slots, self.frame_shape, self.dtype.str)
+
+    @classmethod
+    def attach(cls, spec: tuple, lock) -> 'SharedFrameRing':
+        """按spec()连接已有缓冲"""
+        name, slots, frame_shape, dtype = spec
+        return cls(slots, frame_shape, lock, np.dtype(dtype), name=name)
+
+    def write(self, frame: np.ndarray, seq: int, timestamp: float) -> Optional[int]:
+        """
+        把帧写入一个空闲槽位
+        :return: 槽位号, 没有空闲槽位或尺寸不符时返回None
+        """
+        if frame.shape != self.frame_shape or frame.dtype != self.dtype:
+            return None
+        slot = self.acquire(seq)
+        if slot is None:
+            return None
+        self._frames[slot][...] = frame
+        self.commit(slot, timestamp)
+        return slot
+
+    def acquire(self, seq: int) -> Optional[int]:
+        """
+        占用一个空闲槽位用于就地写入(通过view(slot)取得缓冲), 写完后调用commit
+        :return: 槽位号, 没有空闲槽位时返回None
+        """
+        with self.lock:
+            slot = self._find_free()
+            if slot is None:
+                self.full_count += 1
+                return None
+            self._meta[slot] = (self.WRITING, seq)
+        return slot
+
+    def commit(self, slot: int, timestamp: float):
+        """就地写入完成, 槽位变为可读"""
+        with self.lock:
+            self._times[slot] = timestamp
+            self._meta[slot, 0] = self.READY
+            self.writes += 1
+            self.peak_occupied = max(self.peak_occupied, self._occupied())
+
+    def read(self, slot: int, seq: int) -> Optional[np.ndarray]:
+        """
+        读取槽位中的帧(零拷贝视图), 用完后需调用release
+        :param seq: 期望的帧序号, 槽位已被复用时返回None
+        """
+        with self.lock:
+            state, slot_seq = self._meta[slot]
+            if slot_seq != seq or state not in (self.READY, self.READING):
+                return None
+            self._meta[slot, 0] = self.READING
+        return self._frames[slot]
+
+    def view(self, slot: int) -> np.ndarray:
+        """槽位帧数据的零拷贝视图(不检查状态)"""
+        return self._frames[slot]
+
+    def timestamp(self, slot: int) -> float:
+        return float(self._times[slot])
+
+    def release(self, slot: int):
+        """释放槽位"""
+        with self.lock:
+            self._meta[slot, 0] = self.FREE
+
+    def _find_free(self) -> Optional[int]:
+        for offset in range(self.slots):
+            slot = (self._next + offset) % self.slots
+            if self._meta[slot, 0] == self.FREE:
+                self._next = (slot + 1) % self.slots
+                return slot
+        return None
+
+    def _occupied(self) -> int:
+        return int(np.count_nonzero(self._meta[:, 0] != self.FREE))
+
+    def stats(self) -> dict:
+        """槽位占用统计"""
+        with self.lock:
+            states = self._meta[:, 0].copy()
+        return {
+            'slots': self.slots,
+            'occupied': int(np.count_nonzero(states != self.FREE)),
+            'writing': int(np.count_nonzero(states == self.WRITING)),
+            'ready': int(np.count_nonzero(states == self.READY)),
+            'reading': int(np.count_nonzero(states == self.READING)),
+            'peak_occupied': self.peak_occupied,
+            'writes': self.writes,
+            'full_count': self.full_count,
+        }
+
+    def close(self):
+        """断开本进程的映射, 创建者同时删除共享内存"""
+        self._meta = self._times = self._frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # 仍有视图在使用, 随进程退出释放
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import List, Optional
+import numpy as np
+
+# 各阶段时间戳(time.monotonic())按流水线顺序, 一帧只会经过其中一部分
+STAGES = ('capture', 'dequeue', 'dispatch', 'prepare', 'infer_start', 'infer_end', 'postprocess_end',
+          'propagate_end', 'publish', 'alarm', 'alarm_sound', 'display')
+
+# 端到端延迟: 名称 -> (起点, 终点)
+SPANS = {
+    'capture_to_inference': ('capture', 'infer_end'),
+    'capture_to_publish': ('capture', 'publish'),
+    'capture_to_alarm': ('capture', 'alarm'),
+    'capture_to_alarm_sound': ('capture', 'alarm_sound'),
+    'capture_to_display': ('capture', 'display'),
+}
+
+class LatencyTracer:
+    """
+    逐帧延迟追踪
+    每帧一个trace字典{'seq', 'camera', 阶段名: 时间戳, ...}, 从采集开始各阶段依次打点,
+    未送YOLO的帧另有'skip_reason'(与get_result的帧信息相同),
+    发布后保存最近history帧(之后的报警声音/显示打点直接写回同一个字典).
+    report()给出各相邻阶段和端到端(采集->推理->报警->显示)的延迟分布, export()导出逐帧记录
+    """
+    def __init__(self, history: int = 5000):
+        self.traces = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, trace: dict):
+        """保存一帧已发布的trace"""
+        with self._lock:
+            self.traces.append(trace)
+
+    @staticmethod
+    def mark(trace: Optional[dict], stage: str, timestamp: float):
+        """在trace上打点(trace为None时忽略), 同一阶段只记第一次"""
+        if trace is not None:
+            trace.setdefault(stage, timestamp)
+
+    @staticmethod
+    def _summary(values: List[float]) -> dict:
+        ms = np.array(values) * 1000
+        return {
+            'count': len(values),
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+            'max_ms': float(ms.max()),
+        }
+
+    def report(self, camera: Optional[str] = None) -> dict:
+        """
+        延迟分布
+        :param camera: 只统计该摄像头, 为None时统计全部
+        :return: {'stages': {'前一阶段->后一阶段': 分布}, 'spans': {端到端名称: 分布}}
+        """
+        with self._lock:
+            traces = [t for t in self.traces if camera is None or t.get('camera') == camera]
+        stages, spans = {}, {}
+        for trace in traces:
+            present = [stage for stage in STAGES if stage in trace]
+            for a, b in zip(present, present[1:]):
+                stages.setdefault(f'{a}->{b}', []).append(trace[b] - trace[a])
+            for name, (start, end) in SPANS.items():
+                if start in trace and end in trace:
+                    spans.setdefault(name, []).append(trace[end] - trace[start])
+        return {
+            'frames': len(traces),
+            'stages': {key: self._summary(values) for key, values in stages.items()},
+            'spans': {key: self._summary(values) for key, values in spans.items()},
+        }
+
+    def export(self, path: str) -> int:
+        """
+        导出最近的逐帧trace(JSON行, 时间戳为time.monotonic()秒)
+        :return: 导出的帧数
+        """
+        with self._lock:
+            traces = list(self.traces)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for trace in traces:
+                f.write(json.dumps(trace, ensure_ascii=False) + '\n')
+        return len(traces)
@@ -0,0 +1,133 @@
+import inspect
+import time
+from typing import List, Optional
+import numpy as np
+import supervision as sv
+from detect_v1 import match_alarms, zone_classes, zone_hits
+
+def create_bytetrack(track_thresh: float, track_buffer: int, match_thresh: float, frame_rate: int):
+    """
+    按关键字参数创建sv.ByteTrack, 兼容supervision参数改名前后的版本
+    (0.20起为track_activation_threshold/lost_track_buffer/minimum_matching_threshold)
+    """
+    params = inspect.signature(sv.ByteTrack).parameters
+    if 'track_activation_threshold' in params:
+        return sv.ByteTrack(track_activation_threshold=track_thresh, lost_track_buffer=track_buffer,
+                            minimum_matching_threshold=match_thresh, frame_rate=frame_rate)
+    return sv.ByteTrack(track_thresh=track_thresh, track_buffer=track_buffer,
+                        match_thresh=match_thresh, frame_rate=frame_rate)
+
+def _match_boxes(tracked: np.ndarray, boxes: np.ndarray, min_iou: float = 0.5) -> np.ndarray:
+    """
+    把跟踪器输出的框对应回输入检测(IoU最大且不低于min_iou)
+    :return: 每个跟踪框对应的输入下标, 没有对应的为-1
+    """
+    x1 = np.maximum(tracked[:, None, 0], boxes[None, :, 0])
+    y1 = np.maximum(tracked[:, None, 1], boxes[None, :, 1])
+    x2 = np.minimum(tracked[:, None, 2], boxes[None, :, 2])
+    y2 = np.minimum(tracked[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_t = (tracked[:, 2] - tracked[:, 0]) * (tracked[:, 3] - tracked[:, 1])
+    area_b = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    iou = inter / np.maximum(area_t[:, None] + area_b[None, :] - inter, 1e-6)
+    index = iou.argmax(axis=1)
+    index[iou[np.arange(len(tracked)), index] < min_iou] = -1
+    return index
+
+class ZoneTracker:
+    """
+    单路多目标跟踪 + 进入区域判断
+    检测结果经ByteTrack分配跨帧稳定的track_id, 报警只在某个轨迹第一次进入某个区域时触发一次,
+    目标在画面中停留多久都不会重复报警. 非多区域模式下整个监测区域视为一个区域.
+    需要按帧序号顺序调用update
+    """
+    def __init__(self, frame_rate: int = 30, track_buffer: int = 30, forget_time: float = 10.0,
+                 track_thresh: float = 0.25, match_thresh: float = 0.8):
+        """
+        :param frame_rate: 检测频率(用于换算丢失轨迹的保留时间)
+        :param track_buffer: 轨迹丢失后保留的帧数
+        :param forget_time: 轨迹多久没出现后清除其报警记录(秒)
+        :param track_thresh: 新建轨迹所需的置信度
+        :param match_thresh: 关联匹配阈值
+        """
+        self.tracker = create_bytetrack(track_thresh, track_buffer, match_thresh, frame_rate)
+        self.forget_time = forget_time
+        self._alarmed = {}  # (track_id, 区域下标) -> 最后出现时间
+        self.entries = 0  # 进入区域触发的报警数
+
+    def reset(self):
+        self.tracker.reset()
+        self._alarmed.clear()
+
+    def track(self, detections: np.ndarray) -> np.ndarray:
+        """
+        更新跟踪器并填写检测结果的track_id(没有被跟踪器确认的检测保持-1)
+        :param detections: 结构化检测结果(ALARM_DTYPE), 原地修改
+        """
+        if len(detections) == 0:
+            self.tracker.update_with_detections(sv.Detections.empty())
+            return detections
+        sv_detections = sv.Detections(
+            xyxy=detections['xyxy'],
+            confidence=detections['confidence'],
+            class_id=detections['class_id'],
+            data={'index': np.arange(len(detections))},
+        )
+        tracked = self.tracker.update_with_detections(sv_detections)
+        if len(tracked):
+            # 较新的supervision会把data带到输出, 旧版本不带, 按框重新对应
+            data = getattr(tracked, 'data', None) or {}
+            if 'index' in data:
+                index = np.asarray(data['index'])
+            else:
+                index = _match_boxes(tracked.xyxy, detections['xyxy'])
+            valid = index >= 0
+            detections['track_id'][index[valid]] = tracked.tracker_id[valid]
+        return detections
+
+    def update(self, detections: np.ndarray, shape: tuple, mode: str, zones: List[dict],
+               alarm_classes: List[int], now: Optional[float] = None) -> tuple:
+        """
+        跟踪并判断新进入区域的报警目标
+        :param detections: 该帧全部检测(ALARM_DTYPE)
+        :param shape: 图像尺寸
+        :param mode: 推理模式
+        :param zones: 多区域模式下的区域列表
+        :param alarm_classes: 报警类别
+        :return: 报警检测, 各区域报警, 新进入的报警检测, 各区域新进入的报警{区域名: 检测}
+        """
+        if now is None:
+            now = time.monotonic()
+        self.track(detections)
+        alarms, zone_alarms = match_alarms(detections, shape, mode, zones, alarm_classes)
+
+        # 每个检测属于哪些区域的报警
+        if mode == 'zones':
+            member = zone_hits(detections['xyxy'], shape, zones)
+            for z, zone in enumerate(zones):
+                member[:, z] &= np.isin(detections['class_id'], zone_classes(zone, alarm_classes))
+            names = [zone['name'] for zone in zones]
+        else:
+            member = np.isin(detections['class_id'], alarm_classes)[:, None]
+            names = [None]
+
+        entered = np.zeros(len(detections), dtype=bool)
+        entered_zones = {}
+        for z, name in enumerate(names):
+            new = np.zeros(len(detections), dtype=bool)
+            for i in np.flatnonzero(member[:, z] & (detections['track_id'] >= 0)):
+                key = (int(detections['track_id'][i]), z)
+                if key not in self._alarmed:
+                    new[i] = True
+                self._alarmed[key] = now
+            if new.any():
+                entered |= new
+                if name is not None:
+                    entered_zones[name] = detections[new]
+        self.entries += int(entered.sum())
+
+        # 清除长时间未出现的轨迹
+        stale = [key for key, last_seen in self._alarmed.items() if now - last_seen > self.forget_time]
+        for key in stale:
+            del self._alarmed[key]
+        return alarms, zone_alarms, detections[entered], entered_zones
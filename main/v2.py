@@ -1,25 +1,78 @@
 import cv2
 import numpy as np
 from ultralytics import YOLO
-import pygame
 import time
 import supervision as sv
 import os
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 import threading
-import queue
 from collections import deque
-from detect_v1 import model_init,annotator,mask_img,predicter,select_alarm_classes
+from detect_v1 import model_init,annotator,mask_img,select_alarm_classes,prepare_input,postprocess,draw_roi,match_alarms,zone_hits,ALARM_DTYPE,compose
+from motion_gate import MotionGate
+from alarm_audio import AlarmAudio
+from tracking import ZoneTracker
+from propagate import BoxPropagator
+from event_store import EventStore
+from clip_recorder import ClipRecorder
+from metrics import Metrics, MetricsServer
+from profiler import install_signal_handler
+from tracing import LatencyTracer
+from scheduler import InferenceScheduler
 
 class Config:
     ALARM_CLASSES = [0]  # 默认报警类别(0=person)
     MODEL_PATH = os.path.join('save', 'yolov8n.pt')
+    BACKEND = 'torch'  # 推理后端: 'torch' / 'onnx'(ONNX Runtime) / 'openvino' / 'onnx_int8'(quantize.py生成)
     SOUND_FILE = 'alarm.wav'
+    AUDIO_DRIVER = None  # SDL音频驱动, 无声卡/测试时设为'dummy'
+    AUDIO_DEDUPE = 2.0  # 同一报警声音的最短重复间隔(秒)
     CAMERA_WIDTH = 680
     CAMERA_HEIGHT = 480
     COOL_TIME = 5  # 警报冷却时间(秒)
-    MAX_QUEUE_SIZE = 3  # 图像队列最大长度
-    TARGET_FPS = 30  # 目标帧率
+    TARGET_FPS = 30  # 目标帧率(自适应调度时为每路最高检测频率)
+    IMGSZ = 640  # 推理输入尺寸
+    # 推理模式: 'mask'=整帧掩码, 'crop'=只推理监测区域外接矩形, 'zones'=整帧推理后多区域过滤
+    INFER_MODE = 'mask'
+    
+    # 运动门控: 监测区域内没有变化时跳过YOLO, 只按保活间隔推理
+    MOTION_GATE = False
+    MOTION_THRESHOLD = 0.01  # 放行所需的区域内变化像素比例
+    MOTION_KEEPALIVE = 2.0  # 保活推理间隔(秒)
+    
+    # 自适应推理频率: 按实测推理耗时调整每路检测频率, 报警/运动后短时间恢复全速
+    ADAPTIVE_RATE = False
+    CPU_BUDGET = 0.5  # 推理时间占墙钟时间的比例上限
+    LATENCY_BUDGET = 0.5  # 采集到出结果的延迟上限(秒)
+    MIN_FPS = 1  # 每路最低检测频率
+    BOOST_TIME = 3.0  # 报警/运动后全速检测的持续时间(秒)
+    
+    # 关键帧检测: 每KEYFRAME_INTERVAL帧运行一次YOLO, 中间帧用光流传播检测框(0或1为每帧检测),
+    # 传播时框内角点跟踪成功比例低于PROPAGATE_MIN_RATIO则立即重新检测
+    KEYFRAME_INTERVAL = 0
+    PROPAGATE_MIN_RATIO = 0.5
+    
+    # 目标跟踪: 开启后每个目标(轨迹)进入区域时只报警一次, 不再按COOL_TIME逐帧报警
+    TRACKING = False
+    TRACK_BUFFER = 30  # 轨迹丢失后保留的检测帧数
+    TRACK_FORGET = 10.0  # 轨迹多久没出现后清除其报警记录(秒), 之后再出现会重新报警
+    
+    # 事件库: 报警/检测事件写入SQLite(None为不保存)
+    EVENT_DB = None  # 例如 os.path.join('save', 'events.db')
+    EVENT_DETECTIONS = True  # 同时保存detection事件(否则只保存报警)
+    
+    # 报警录像: 内存中保留最近CLIP_PRE_ROLL秒的JPEG帧, 报警时连同之后CLIP_POST_ROLL秒写成视频
+    CLIP_DIR = None  # 录像目录(None为不录像), 例如 os.path.join('save', 'clips'), 每路一个子目录
+    CLIP_PRE_ROLL = 5.0
+    CLIP_POST_ROLL = 5.0
+    CLIP_FPS = 10
+    
+    # 指标: 计数器/耗时直方图, METRICS_PORT不为None时在本机该端口提供/metrics(Prometheus文本格式)
+    METRICS_PORT = None  # 例如 9108
+    
+    # 延迟追踪: 每帧记录采集/推理/报警/显示各阶段时间戳, 保留最近TRACE_HISTORY帧供统计,
+    # TRACE_FILE不为None时停止处理器时导出逐帧记录(JSON行)
+    TRACE_HISTORY = 5000
+    TRACE_FILE = None  # 例如 os.path.join('save', 'trace.jsonl')
     
     # 监测区域坐标
     MASK_POINTS = [
@@ -28,151 +81,680 @@ class Config:
         (5.5/10, 9.9/10),  # 右下
         (0.1/10, 9.9/10)   # 左下
     ]
+    
+    # 多区域模式下的区域列表, classes为该区域的报警类别(None或不填则用界面选择的类别),
+    # sound为该区域的报警声音(不填则用SOUND_FILE)
+    ZONES = [
+        {'name': '区域1', 'points': MASK_POINTS, 'classes': None},
+    ]
+    
+    # 摄像头列表, 每路可单独指定source/alarm_classes/mask_points/zones/mode/motion_gate/tracking,
+    # 未指定的项使用上面的全局配置. 所有摄像头共用一个模型, 按batch推理
+    CAMERAS = [
+        {'name': '摄像头0', 'source': 0},
+    ]
+    
+    # 执行方式: 'thread'=单个处理线程, 'process'=多进程推理/绘制(绕开GIL, 多路时用满多核)
+    EXECUTION = 'thread'
+    WORKERS = max(1, (os.cpu_count() or 2) // 2)  # 多进程模式的工作进程数
+    MAX_IN_FLIGHT = 2  # 每个工作进程最多同时排队的帧数
+    SHARED_MEMORY = True  # 多进程模式下经共享内存环形缓冲交换帧(不pickle整帧)
 
-class VideoProcessor:
+class FrameSlot:
+    """
+    单帧交接槽(最新帧优先)
+    新帧直接覆盖未被取走的旧帧, 消费方总是拿到最新的一帧, 并统计被覆盖的帧数
+    """
     def __init__(self):
-        self.model = model_init(Config.MODEL_PATH)
-        self.running = False
-        self.frame_queue = queue.Queue(maxsize=Config.MAX_QUEUE_SIZE)
-        self.result_queue = queue.Queue(maxsize=Config.MAX_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._item = None
+        self.put_count = 0  # 放入总数
+        self.take_count = 0  # 取走总数
+        self.overwritten = 0  # 未被取走就被新帧覆盖的数量
+        
+    def put(self, item) -> bool:
+        """放入一项, 覆盖了旧项时返回True"""
+        with self._lock:
+            overwritten = self._item is not None
+            if overwritten:
+                self.overwritten += 1
+            self._item = item
+            self.put_count += 1
+        return overwritten
+        
+    def take(self):
+        """取走当前项(非阻塞), 为空时返回None"""
+        with self._lock:
+            item = self._item
+            self._item = None
+            if item is not None:
+                self.take_count += 1
+        return item
+        
+    @property
+    def pending(self) -> int:
+        """槽中未被取走的项数(0或1)"""
+        return int(self._item is not None)
+
+class CameraStream:
+    """单路摄像头的帧/结果交接槽、区域/类别配置和报警状态"""
+    def __init__(self, name: str, source=0, alarm_classes: Optional[List[int]] = None,
+                 mask_points: Optional[List[tuple]] = None, zones: Optional[List[dict]] = None,
+                 mode: Optional[str] = None, motion_gate: Optional[bool] = None,
+                 tracking: Optional[bool] = None):
+        self.name = name
+        self.source = source
+        self.alarm_classes = list(Config.ALARM_CLASSES if alarm_classes is None else alarm_classes)
+        self.mask_points = Config.MASK_POINTS if mask_points is None else mask_points
+        self.zones = Config.ZONES if zones is None else zones
+        self.mode = Config.INFER_MODE if mode is None else mode
+        
+        # 运动门控(可选)
+        self.gate = None
+        if Config.MOTION_GATE if motion_gate is None else motion_gate:
+            regions = [zone['points'] for zone in self.zones] if self.mode == 'zones' else [self.mask_points]
+            self.gate = MotionGate(regions, Config.MOTION_THRESHOLD, Config.MOTION_KEEPALIVE)
+        
+        # 目标跟踪(可选)
+        self.tracker = None
+        if Config.TRACKING if tracking is None else tracking:
+            self.tracker = ZoneTracker(Config.TARGET_FPS, Config.TRACK_BUFFER, Config.TRACK_FORGET)
+        
+        # 关键帧检测 + 光流传播(可选)
+        self.propagator = None
+        if Config.KEYFRAME_INTERVAL > 1:
+            self.propagator = BoxPropagator(Config.KEYFRAME_INTERVAL, min_ratio=Config.PROPAGATE_MIN_RATIO)
+        
+        # 报警录像(可选)
+        self.recorder = None
+        if Config.CLIP_DIR:
+            self.recorder = ClipRecorder(os.path.join(Config.CLIP_DIR, name), Config.CLIP_PRE_ROLL,
+                                         Config.CLIP_POST_ROLL, Config.CLIP_FPS)
+            
+        self.frame_slot = FrameSlot()  # (帧序号, 采集时间戳, 帧)
+        self.result_slot = FrameSlot()  # (标注后的帧, 报警检测, 帧信息)
+        self.frame_seq = 0
+        self.frame_shape = None  # 最近一帧的尺寸
+        self.traces = {}  # 帧序号 -> 处理中的延迟追踪记录
         self.alarm_status = False
         self.last_alert_time = 0
-        self.alarm_classes = Config.ALARM_CLASSES
+        self.zone_alarms = {}  # 最近一帧各区域报警{区域名: 报警检测}
+
+    @classmethod
+    def from_config(cls, camera: dict) -> 'CameraStream':
+        """由Config.CAMERAS中的一项创建"""
+        return cls(**camera)
+
+    def next_seq(self) -> int:
+        """分配下一个帧序号(只在采集侧调用)"""
+        self.frame_seq += 1
+        return self.frame_seq
+
+    def stats(self) -> dict:
+        """帧交接统计: 采集/处理/被覆盖的帧数, 以及未被取走就被覆盖的结果数"""
+        return {
+            'captured': self.frame_slot.put_count,
+            'processed': self.frame_slot.take_count,
+            'overwritten': self.frame_slot.overwritten,
+            'results_dropped': self.result_slot.overwritten,
+        }
+
+def _first_stream_property(name: str) -> property:
+    """单路兼容: 把处理器属性转发到第一路摄像头"""
+    return property(lambda self: getattr(self.streams[0], name),
+                    lambda self, value: setattr(self.streams[0], name, value))
+
+class VideoProcessor:
+    """
+    多路视频处理器
+    所有摄像头共用一个模型, 处理线程每轮收集各路最新帧后一次batch推理,
+    结果按摄像头分发到各自的结果槽和报警状态.
+    不传cameras时只处理一路(Config.CAMERAS[0]), 接口与原单路版本一致.
+    render为False时不合成任何标注画面(结果槽里的帧为None), 只通过add_listener输出检测/报警事件
+    """
+    def __init__(self, cameras: Optional[List[dict]] = None, render: bool = True):
+        self.running = False
+        self.render = render
+        self._listeners = []
+        if cameras is None:
+            cameras = Config.CAMERAS[:1]
+        self.streams = [CameraStream.from_config(camera) for camera in cameras]
+        self.model = self._load_model()
+        self._frame_event = threading.Event()
+        self.scheduler = None
+        if Config.ADAPTIVE_RATE:
+            self.scheduler = InferenceScheduler(Config.CPU_BUDGET, Config.LATENCY_BUDGET,
+                                                Config.TARGET_FPS, Config.MIN_FPS,
+                                                boost_time=Config.BOOST_TIME)
+        self.audio = self._create_audio()
+        self.event_store = None
+        if Config.EVENT_DB:
+            self.event_store = EventStore(Config.EVENT_DB, Config.EVENT_DETECTIONS)
+            self.add_listener(self.event_store)
+        self.metrics = Metrics()
+        self._register_metrics()
+        self.metrics_server = MetricsServer(self.metrics, Config.METRICS_PORT) if Config.METRICS_PORT else None
+        self.tracer = LatencyTracer(Config.TRACE_HISTORY)
+    
+    def _register_metrics(self):
+        """注册指标(processor.metrics.snapshot()读取, 或经/metrics抓取)"""
+        m = self.metrics
+        m.counter('frames_captured_total', '采集到的帧数')
+        m.counter('frames_dropped_total', '未处理就被丢弃的帧数(被新帧覆盖, 或多进程模式下工作进程都满)')
+        m.counter('frames_gated_total', '未送YOLO的帧数(运动门控/频率调度)')
+        m.counter('frames_inferred_total', '经YOLO推理的帧数')
+        m.counter('frames_propagated_total', '由光流传播检测框的帧数')
+        m.counter('results_unread_total', '未被显示端取走就被覆盖的结果数')
+        m.counter('alarms_total', '触发的报警数')
+        m.counter('errors_total', '处理出错次数')
+        m.histogram('stage_seconds', '各处理阶段耗时(秒)')
+        m.histogram('result_age_seconds', '采集到出结果的延迟(秒)')
+        m.histogram('latency_seconds', '采集到推理完成/报警/显示的端到端延迟(秒)')
+        m.histogram('batch_size', '每次推理的帧数', buckets=(1, 2, 4, 8, 16))
+        m.gauge('frame_queue_depth', '交接槽中待处理的帧数',
+                lambda: {(('camera', stream.name),): stream.frame_slot.pending for stream in self.streams})
+        if self.event_store is not None:
+            m.gauge('event_store_pending', '事件库待写入的事件数', lambda: self.event_store.stats()['pending'])
+    
+    def _create_audio(self) -> Optional[AlarmAudio]:
+        """报警音频服务, 没有配置任何声音时返回None"""
+        zone_sounds = {zone['name']: zone['sound'] for stream in self.streams
+                       for zone in stream.zones if zone.get('sound')}
+        if not Config.SOUND_FILE and not zone_sounds:
+            return None
+        return AlarmAudio(Config.SOUND_FILE, zone_sounds, Config.AUDIO_DEDUPE, Config.AUDIO_DRIVER)
+    
+    def _load_model(self):
+        """加载推理模型(多路batch推理时导出的模型需要动态shape)"""
+        return model_init(Config.MODEL_PATH, Config.BACKEND, Config.IMGSZ,
+                          dynamic=len(self.streams) > 1)
+    
+    @property
+    def class_names(self) -> dict:
+        """类别名{类别ID: 名称}(模型不在本进程时为空)"""
+        return getattr(self.model, 'names', None) or {}
+    
+    # 单路兼容接口
+    frame_slot = _first_stream_property('frame_slot')
+    result_slot = _first_stream_property('result_slot')
+    alarm_classes = _first_stream_property('alarm_classes')
+    alarm_status = _first_stream_property('alarm_status')
+    last_alert_time = _first_stream_property('last_alert_time')
+    zone_alarms = _first_stream_property('zone_alarms')
         
     def start(self):
-        """启动处理线程"""
+        """启动指标服务、处理线程、报警音频服务、事件库写线程和报警录像"""
+        # 指标端口不可用时只提示, 不影响检测
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                print(f"指标服务启动失败(端口{Config.METRICS_PORT}): {e}")
+                self.metrics_server = None
+        if self.audio is not None:
+            self.audio.start()
+        if self.event_store is not None:
+            self.event_store.start()
+        for stream in self.streams:
+            if stream.recorder is not None:
+                stream.recorder.start()
         self.running = True
-        self.processing_thread = threading.Thread(target=self._process_frames)
+        self.processing_thread = threading.Thread(target=self._process_frames, name='processing')
         self.processing_thread.daemon = True
         self.processing_thread.start()
         
     def stop(self):
-        """停止处理线程"""
+        """停止处理线程、报警音频服务、事件库写线程和报警录像"""
         self.running = False
         self.processing_thread.join()
+        if self.audio is not None:
+            self.audio.stop()
+        if self.event_store is not None:
+            self.event_store.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        for stream in self.streams:
+            if stream.recorder is not None:
+                stream.recorder.stop()
+        if Config.TRACE_FILE:
+            count = self.tracer.export(Config.TRACE_FILE)
+            print(f"延迟追踪已导出{count}帧: {Config.TRACE_FILE}")
         
-    def put_frame(self, frame: np.ndarray):
-        """将帧放入处理队列(非阻塞)"""
-        try:
-            self.frame_queue.put_nowait(frame)
-        except queue.Full:
-            pass  # 丢弃旧帧，保持最新帧
+    def put_frame(self, frame: np.ndarray, camera: int = 0, timestamp: Optional[float] = None):
+        """
+        将帧放入指定摄像头的交接槽(非阻塞, 覆盖未处理的旧帧)
+        :param frame: 图像帧
+        :param camera: 摄像头序号
+        :param timestamp: 采集时间(time.monotonic()), 不传则取当前时间
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        stream = self.streams[camera]
+        stream.frame_shape = frame.shape
+        if stream.recorder is not None:
+            stream.recorder.push(frame, timestamp)
+        self.metrics.inc('frames_captured_total', camera=stream.name)
+        if stream.frame_slot.put((stream.next_seq(), timestamp, frame)):
+            self.metrics.inc('frames_dropped_total', camera=stream.name)
+        self._frame_event.set()
             
-    def get_result(self) -> Optional[Tuple[np.ndarray, List[int]]]:
-        """从结果队列获取处理结果(非阻塞)"""
-        try:
-            return self.result_queue.get_nowait()
-        except queue.Empty:
-            return None
+    def get_result(self, camera: int = 0) -> Optional[Tuple[np.ndarray, np.ndarray, dict]]:
+        """
+        从指定摄像头获取最新处理结果(非阻塞)
+        :return: (标注后的帧, 报警检测(ALARM_DTYPE结构化数组), 帧信息), 帧信息包含
+                 camera/seq/capture_time/age(采集到出结果的秒数)/gated(是否未送YOLO)/
+                 skip_reason(未送YOLO的原因: 'motion'/'schedule')/propagated(检测框是否由光流传播得到)/
+                 trace(各阶段时间戳, 显示后应调用mark_displayed(info))
+        """
+        return self.streams[camera].result_slot.take()
+        
+    def mark_displayed(self, info: dict):
+        """显示端在画面显示后调用, 记录该帧的显示时间"""
+        trace = info.get('trace')
+        if trace is None or 'display' in trace:
+            return
+        trace['display'] = time.monotonic()
+        self.metrics.observe('latency_seconds', trace['display'] - trace['capture'],
+                             camera=info['camera'], span='display')
+        
+    def latency_report(self, camera: Optional[int] = None) -> dict:
+        """
+        最近各帧的延迟分布(采集->推理->报警->显示及相邻阶段), 见LatencyTracer.report
+        :param camera: 摄像头序号, 为None时统计全部
+        """
+        return self.tracer.report(None if camera is None else self.streams[camera].name)
+        
+    def add_listener(self, callback: Callable[[dict], None]):
+        """
+        订阅检测/报警事件, 回调在处理线程中执行, 应尽快返回
+        事件: {'type': 'detection'/'alarm', 'camera', 'seq', 'capture_time', 'time'(墙钟时间),
+               'detections': [{'class_id', 'confidence', 'xyxy', 'track_id', 'zones'}, ...],
+               'zones': [区域名, ...]}
+        detection事件在有检测目标的帧上发出, alarm事件在报警触发(过了冷却时间, 或开启跟踪时
+        有新轨迹进入区域)时发出, track_id为跟踪ID(未开启跟踪时为-1)
+        """
+        self._listeners.append(callback)
+        
+    def remove_listener(self, callback: Callable[[dict], None]):
+        """取消订阅"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+        
+    def _emit(self, event_type: str, stream: CameraStream, seq: int, capture_time: float,
+              detections: np.ndarray, zones: List[str]):
+        """向订阅者发出事件(没有订阅者时不构造事件)"""
+        if not self._listeners:
+            return
+        # 每个目标所在的区域
+        if stream.mode == 'zones' and stream.frame_shape is not None:
+            hits = zone_hits(detections['xyxy'], stream.frame_shape, stream.zones)
+            names = [zone['name'] for zone in stream.zones]
+            det_zones = [[name for name, hit in zip(names, row) if hit] for row in hits.tolist()]
+        else:
+            det_zones = [[] for _ in range(len(detections))]
+        event = {
+            'type': event_type,
+            'camera': stream.name,
+            'seq': seq,
+            'capture_time': capture_time,
+            'time': time.time(),
+            'detections': [{'class_id': class_id, 'confidence': round(conf, 4),
+                            'xyxy': [round(v, 1) for v in xyxy], 'track_id': track_id, 'zones': in_zones}
+                           for xyxy, class_id, conf, track_id, in_zones in zip(detections['xyxy'].tolist(),
+                                                                            detections['class_id'].tolist(),
+                                                                            detections['confidence'].tolist(),
+                                                                            detections['track_id'].tolist(),
+                                                                            det_zones)],
+            'zones': zones,
+        }
+        for callback in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"事件订阅者出错: {e}")
+        
+    def request_keyframe(self, camera: int = 0):
+        """按需检测: 指定摄像头的下一帧运行YOLO(未开启关键帧检测时每帧都检测)"""
+        propagator = self.streams[camera].propagator
+        if propagator is not None:
+            propagator.force = True
+        
+    def frame_stats(self, camera: int = 0) -> dict:
+        """指定摄像头的帧交接统计"""
+        return self.streams[camera].stats()
+        
+    def gate_stats(self, camera: int = 0) -> Optional[dict]:
+        """指定摄像头的运动门控统计, 未启用门控时返回None"""
+        gate = self.streams[camera].gate
+        return gate.stats() if gate is not None else None
+        
+    def keyframe_stats(self, camera: int = 0) -> Optional[dict]:
+        """指定摄像头的关键帧/光流传播统计, 未启用时返回None"""
+        propagator = self.streams[camera].propagator
+        return propagator.stats() if propagator is not None else None
             
     def _process_frames(self):
         """处理线程主函数"""
         while self.running:
+            self._frame_event.wait(timeout=0.1)
+            self._frame_event.clear()
+            
             try:
-                frame = self.frame_queue.get(timeout=0.1)
-                
-                # 处理图像
-                masked_img = mask_img(frame.copy(), Config.MASK_POINTS)
-                results, processed_img = predicter(self.model, frame, masked_img)
-                annotated_frame, alarms = annotator(results, processed_img, self.alarm_classes)
-                
-                # 检查警报
-                current_time = time.time()
-                if alarms and (current_time - self.last_alert_time) >= Config.COOL_TIME:
-                    self.last_alert_time = current_time
-                    self.alarm_status = True
-                    trigger(Config.SOUND_FILE)
-                
-                # 将结果放入队列
-                try:
-                    self.result_queue.put_nowait((annotated_frame, alarms))
-                except queue.Full:
-                    pass
-                    
-            except queue.Empty:
-                continue
+                batch = self._collect_batch()
+                if batch:
+                    self._process_batch(batch)
             except Exception as e:
+                self.metrics.inc('errors_total')
                 print(f"处理帧时出错: {e}")
 
-def trigger(sound_file: str):
-    """非阻塞播放警报声音"""
-    def play_sound():
-        try:
-            pygame.mixer.init()
-            pygame.mixer.music.load(sound_file)
-            pygame.mixer.music.play()
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
-            pygame.mixer.quit()
-        except Exception as e:
-            print(f"播放声音失败: {e}")
-    
-    audio_thread = threading.Thread(target=play_sound)
-    audio_thread.daemon = True
-    audio_thread.start()
+    def _collect_batch(self) -> List[tuple]:
+        """收集各路最新帧, 被运动门控或频率调度跳过的帧直接发布"""
+        batch = []
+        now = time.monotonic()
+        for stream in self.streams:
+            item = stream.frame_slot.take()
+            if item is None:
+                continue
+            trace = self._start_trace(stream, item)
+            # 区域内无变化的帧不送YOLO
+            if stream.gate is not None:
+                if not stream.gate.check(item[2], item[1]):
+                    self._publish_gated(stream, item, 'motion')
+                    continue
+                if self.scheduler is not None and stream.gate.decisions[-1][2] == 'motion':
+                    self.scheduler.boost(stream.name, now)
+            # 非关键帧用光流传播上一次的检测框
+            if stream.propagator is not None:
+                propagate_start = time.monotonic()
+                detections = stream.propagator.step(item[0], item[2])
+                self.metrics.observe('stage_seconds', time.monotonic() - propagate_start, stage='propagate')
+                if detections is not None:
+                    trace['propagate_end'] = time.monotonic()
+                    self._publish_propagated(stream, item, detections)
+                    continue
+            # 超出推理预算的帧降频
+            if self.scheduler is not None and not self.scheduler.should_run(stream.name, now):
+                self._publish_gated(stream, item, 'schedule')
+                continue
+            batch.append((stream, item))
+        return batch
+
+    def _start_trace(self, stream: CameraStream, item: tuple) -> dict:
+        """为取出的帧建立延迟追踪记录(采集/取出时间), 处理中的记录按帧序号保存在该路上"""
+        seq, capture_time, _ = item
+        trace = {'camera': stream.name, 'seq': seq, 'capture': capture_time, 'dequeue': time.monotonic()}
+        # 丢弃早已不会发布的旧记录(多进程模式下超时未返回的帧)
+        if len(stream.traces) > 64:
+            for old in [s for s in list(stream.traces) if s < seq - 64]:
+                stream.traces.pop(old, None)
+        stream.traces[seq] = trace
+        return trace
+
+    def _publish_gated(self, stream: CameraStream, item: tuple, reason: str):
+        """
+        发布未送YOLO的帧: 只画区域, 没有检测结果
+        :param reason: 跳过原因, 'motion'=运动门控, 'schedule'=频率调度
+        """
+        seq, capture_time, frame = item
+        trace = stream.traces.pop(seq, None)
+        annotated_frame = None
+        if self.render:
+            annotated_frame = frame.copy()
+            draw_roi(annotated_frame, stream.mode, stream.mask_points, stream.zones)
+        stream.zone_alarms = {}
+        info = {
+            'camera': stream.name,
+            'seq': seq,
+            'capture_time': capture_time,
+            'age': time.monotonic() - capture_time,
+            'gated': True,
+            'skip_reason': reason,
+            'propagated': False,
+            'trace': trace,
+        }
+        if trace is not None:
+            trace['skip_reason'] = reason
+            trace['publish'] = time.monotonic()
+            self.tracer.record(trace)
+        self.metrics.inc('frames_gated_total', camera=stream.name, reason=reason)
+        self.metrics.observe('result_age_seconds', info['age'], camera=stream.name)
+        if stream.result_slot.put((annotated_frame, np.empty(0, dtype=ALARM_DTYPE), info)):
+            self.metrics.inc('results_unread_total', camera=stream.name)
+
+    def _publish_propagated(self, stream: CameraStream, item: tuple, detections: np.ndarray):
+        """发布光流传播得到的非关键帧结果: 同样做区域报警判断和标注, 只是不运行YOLO"""
+        seq, capture_time, frame = item
+        alarms, zone_alarms = match_alarms(detections, frame.shape, stream.mode, stream.zones,
+                                           stream.alarm_classes)
+        annotated_frame = None
+        if self.render:
+            annotated_frame = compose(frame, detections, self.class_names, stream.mode,
+                                      stream.mask_points, stream.zones)
+        self._publish_result(stream, seq, capture_time, annotated_frame, detections, alarms, zone_alarms,
+                             propagated=True)
+
+    def _process_batch(self, batch: List[tuple]):
+        """
+        对多路帧做一次batch推理并分发结果
+        :param batch: [(CameraStream, (帧序号, 采集时间戳, 帧)), ...]
+        """
+        start_time = time.monotonic()
+        inputs = [prepare_input(frame, stream.mode, stream.mask_points) for stream, (_, _, frame) in batch]
+        infer_start = time.monotonic()
+        results = self.model([model_input for model_input, _, _ in inputs],
+                             stream=False, save=False, imgsz=Config.IMGSZ)
+        post_start = time.monotonic()
+        for stream, (seq, _, _) in batch:
+            trace = stream.traces.get(seq)
+            if trace is not None:
+                trace.update(prepare=start_time, infer_start=infer_start, infer_end=post_start)
+                self.metrics.observe('latency_seconds', post_start - trace['capture'],
+                                     camera=stream.name, span='inference')
+        self.metrics.observe('batch_size', len(batch))
+        self.metrics.observe('stage_seconds', infer_start - start_time, stage='prepare')
+        self.metrics.observe('stage_seconds', post_start - infer_start, stage='inference')
+        
+        for (stream, (seq, capture_time, frame)), (_, masked_img, box), result in zip(batch, inputs, results):
+            # 发布的画面交给显示端持有(可能在上面继续画字), 每帧合成到新数组
+            annotated_frame, detections, alarms, zone_alarms = postprocess(
+                [result], frame, masked_img, box, stream.alarm_classes, stream.mode,
+                stream.zones, stream.mask_points, render=self.render)
+            publish_start = time.monotonic()
+            LatencyTracer.mark(stream.traces.get(seq), 'postprocess_end', publish_start)
+            self.metrics.observe('stage_seconds', publish_start - post_start, stage='postprocess')
+            self._publish_result(stream, seq, capture_time, annotated_frame, detections, alarms, zone_alarms)
+            post_start = time.monotonic()
+            self.metrics.observe('stage_seconds', post_start - publish_start, stage='publish')
+            
+        if self.scheduler is not None:
+            oldest = min(capture_time for _, (_, capture_time, _) in batch)
+            now = time.monotonic()
+            self.scheduler.record(now - start_time, now - oldest)
+
+    def _publish_result(self, stream: CameraStream, seq: int, capture_time: float,
+                        annotated_frame: Optional[np.ndarray], detections: np.ndarray,
+                        alarms: np.ndarray, zone_alarms: dict, propagated: bool = False):
+        """
+        跟踪和报警判断, 发出事件, 并把一帧的处理结果放入该路的结果槽(覆盖未被取走的旧结果)
+        开启跟踪时只有新轨迹进入区域才报警, 否则任一帧有报警目标且过了冷却时间就报警
+        :param propagated: 检测框是否由光流传播得到(非关键帧)
+        """
+        trace = stream.traces.pop(seq, None)
+        if stream.propagator is not None and not propagated:
+            stream.propagator.seed(seq, detections)
+        if stream.tracker is not None:
+            alarms, zone_alarms, fired, fired_zones = stream.tracker.update(
+                detections, stream.frame_shape, stream.mode, stream.zones, stream.alarm_classes)
+            fired_zones = list(fired_zones)
+        stream.zone_alarms = zone_alarms
+        zones = [name for name, hits in zone_alarms.items() if len(hits)]
+        if len(detections):
+            self._emit('detection', stream, seq, capture_time, detections, zones)
+        
+        # 检查警报
+        current_time = time.time()
+        if stream.tracker is None:
+            fired, fired_zones = alarms, zones
+            if current_time - stream.last_alert_time < Config.COOL_TIME:
+                fired = alarms[:0]
+        if len(fired):
+            self.metrics.inc('alarms_total', camera=stream.name)
+            stream.last_alert_time = current_time
+            stream.alarm_status = True
+            if trace is not None:
+                trace['alarm'] = time.monotonic()
+                self.metrics.observe('latency_seconds', trace['alarm'] - capture_time,
+                                     camera=stream.name, span='alarm')
+            if self.audio is not None:
+                self.audio.play(fired_zones, trace)
+            if stream.recorder is not None:
+                stream.recorder.trigger(capture_time, '_'.join(fired_zones))
+            self._emit('alarm', stream, seq, capture_time, fired, fired_zones)
+        if len(alarms) and self.scheduler is not None:
+            self.scheduler.boost(stream.name)
+        
+        info = {
+            'camera': stream.name,
+            'seq': seq,
+            'capture_time': capture_time,
+            'age': time.monotonic() - capture_time,
+            'gated': False,
+            'skip_reason': None,
+            'propagated': propagated,
+            'trace': trace,
+        }
+        if trace is not None:
+            trace['publish'] = time.monotonic()
+            self.tracer.record(trace)
+        self.metrics.inc('frames_propagated_total' if propagated else 'frames_inferred_total', camera=stream.name)
+        self.metrics.observe('result_age_seconds', info['age'], camera=stream.name)
+        if stream.result_slot.put((annotated_frame, alarms, info)):
+            self.metrics.inc('results_unread_total', camera=stream.name)
+
+class CaptureThread:
+    """
+    独立的摄像头采集线程
+    按摄像头自身帧率读取, 带采集时间戳直接推送给处理器, 不占用GUI/显示线程
+    """
+    def __init__(self, processor: VideoProcessor, camera: int = 0, source=None):
+        self.processor = processor
+        self.camera = camera
+        self.source = processor.streams[camera].source if source is None else source
+        self.cap = None
+        self.running = False
+        self.failed = False  # 读取失败(摄像头断开等)
+        self.capture_thread = None
+        self.frames_captured = 0
+        
+    def open(self) -> bool:
+        """打开摄像头, 失败返回False"""
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            return False
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAMERA_WIDTH)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAMERA_HEIGHT)
+        return True
+        
+    def start(self):
+        """启动采集线程(需先open)"""
+        self.running = True
+        self.failed = False
+        self.capture_thread = threading.Thread(target=self._capture_frames, name=f'capture-{self.camera}')
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+        
+    def stop(self):
+        """停止采集线程并释放摄像头"""
+        self.running = False
+        if self.capture_thread is not None and self.capture_thread.is_alive():
+            self.capture_thread.join()
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+            
+    def _capture_frames(self):
+        """采集线程主函数"""
+        while self.running:
+            ret, frame = self.cap.read()
+            timestamp = time.monotonic()
+            if not ret:
+                print(f"无法读取摄像头帧: {self.source}")
+                self.failed = True
+                break
+            self.frames_captured += 1
+            self.processor.put_frame(frame, self.camera, timestamp)
+
+def create_processor(cameras: Optional[List[dict]] = None, render: bool = True) -> VideoProcessor:
+    """按Config.EXECUTION创建处理器"""
+    if Config.EXECUTION == 'process':
+        from pool import ProcessPoolProcessor
+        return ProcessPoolProcessor(cameras, render=render)
+    return VideoProcessor(cameras, render)
 
 # 以下是原有的辅助函数(保持不变)
 # def model_init(path: str) -> YOLO: ...
 # def annotator(results, frame: np.ndarray, alarm_classes: List[int]) -> tuple: ...
 # def mask_img(img: np.ndarray, mask_points: List[tuple]) -> np.ndarray: ...
-# def predicter(model: YOLO, img: np.ndarray, masked_img: np.ndarray) -> tuple: ...
 # def select_alarm_classes() -> List[int]: ...
 
 def main():
     # 初始化
     alarm_classes = select_alarm_classes()
-    processor = VideoProcessor()
-    processor.alarm_classes = alarm_classes
+    processor = create_processor(Config.CAMERAS)
+    for stream in processor.streams:
+        stream.alarm_classes = alarm_classes
     processor.start()
+    install_signal_handler()  # kill -USR1 <pid> 开始采样分析
     
-    # 初始化摄像头
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("无法打开摄像头")
-        return
+    # 初始化摄像头, 每路一个采集线程
+    captures = []
+    for camera in range(len(processor.streams)):
+        capture = CaptureThread(processor, camera)
+        if not capture.open():
+            print(f"无法打开摄像头: {processor.streams[camera].name}")
+            for opened in captures:
+                opened.stop()
+            processor.stop()
+            return
+        captures.append(capture)
+    for capture in captures:
+        capture.start()
     
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAMERA_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAMERA_HEIGHT)
-    
-    # 初始化pygame音频
-    pygame.mixer.init()
-    
-    # FPS计算
-    frame_times = deque(maxlen=30)
-    last_time = time.time()
+
+    # FPS计算: 各路最近30个处理结果的到达时间
+    result_times = [deque(maxlen=30) for _ in processor.streams]
     
     try:
         while True:
-            # 读取帧
-            success, frame = cap.read()
-            if not success:
-                print("无法读取摄像头帧")
+            if any(capture.failed for capture in captures):
                 break
+            current_time = time.time()
             
-            # 将帧送入处理队列
-            processor.put_frame(frame)
-            
-            # 获取处理结果
-            result = processor.get_result()
-            if result is not None:
-                annotated_frame, alarms = result
+            # 获取各路处理结果
+            for camera, stream in enumerate(processor.streams):
+                result = processor.get_result(camera)
+                if result is None:
+                    continue
+                annotated_frame, alarms, info = result
+                times = result_times[camera]
+                times.append(current_time)
+                fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 10 and times[-1] > times[0] else None
                 
-                # 显示结果
-                cv2.imshow("入侵检测系统", annotated_frame)
-                
-                # 显示警报状态
-                if alarms:
+                # 显示警报状态、FPS和采集到出结果的延迟
+                if len(alarms):
                     cv2.putText(annotated_frame, "ALARM!", (10, 30), 
                                 cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            
-            # 计算并显示FPS
-            current_time = time.time()
-            frame_times.append(current_time - last_time)
-            last_time = current_time
-            if len(frame_times) > 10:
-                fps = len(frame_times) / sum(frame_times)
-                cv2.putText(frame, f"FPS: {fps:.1f}", (10, 60), 
+                if fps is not None:
+                    cv2.putText(annotated_frame, f"FPS: {fps:.1f}", (10, 60), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                cv2.putText(annotated_frame, f"Age: {info['age'] * 1000:.0f}ms", (10, 90), 
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                
+                # 显示结果
+                cv2.imshow(f"入侵检测系统 - {stream.name}", annotated_frame)
+                processor.mark_displayed(info)
             
             # 控制显示速率
             delay = max(1, int(1000 / Config.TARGET_FPS - (time.time() - current_time) * 1000))
@@ -180,10 +762,10 @@ def main():
                 break
                 
     finally:
+        for capture in captures:
+            capture.stop()
         processor.stop()
-        cap.release()
         cv2.destroyAllWindows()
-        pygame.mixer.quit()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
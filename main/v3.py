@@ -1,13 +1,13 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QComboBox, 
-                             QCheckBox, QGroupBox)
+                             QCheckBox, QGroupBox,QShortcut)
 from PyQt5.QtCore import Qt, QTimer,QPoint, QSettings
-from PyQt5.QtGui import QImage, QPixmap,QBrush,QColor,QPolygon, QPen,QCursor
+from PyQt5.QtGui import QImage, QPixmap,QBrush,QColor,QPolygon, QPen,QCursor,QKeySequence
 import cv2
 import numpy as np
-from v2 import VideoProcessor,Config
-import pygame
+from v2 import create_processor,CaptureThread,Config
+from profiler import install_signal_handler,start_profiling
 import time
 from PyQt5.QtGui import QPainter
 
@@ -17,8 +17,8 @@ class DetectionApp(QMainWindow):
         self.setWindowTitle("入侵检测系统，郭子靖限定版")
         self.setGeometry(100, 100, 1000, 700)
         
-        # 初始化摄像头和处理线程
-        self.cap = None
+        # 初始化摄像头采集线程和处理线程
+        self.capture = None
         self.processor = None
         self.is_camera_on = False
         
@@ -54,10 +54,15 @@ class DetectionApp(QMainWindow):
         self.frame_count = 0
         self.fps = 0
         self.fps_update_time = time.time()
+        self.result_age = 0  # 最近结果从采集到处理完成的延迟(秒)
 
         self.background_image = None
         self.load_background("background2.jpg")  # 默认背景图片路径
 
+        # 隐藏快捷键: 开始30秒采样分析(现场排查卡顿)
+        self.profile_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+        self.profile_shortcut.activated.connect(self.start_profiling)
+
         # # 检测区域相关变量
         # self.drawing_roi = False
         # self.current_roi = []
@@ -106,6 +111,7 @@ class DetectionApp(QMainWindow):
         # 报警声音控制
         self.sound_check = QCheckBox("启用报警声音")
         self.sound_check.setChecked(True)
+        self.sound_check.toggled.connect(self.update_sound_enabled)
         
         # 状态信息
         self.status_label = QLabel("状态: 摄像头未开启")
@@ -131,19 +137,22 @@ class DetectionApp(QMainWindow):
             self.status_label.setText("状态: 摄像头运行中")
             
     def start_camera(self):
-        """启动摄像头和处理线程"""
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
+        """启动摄像头采集线程和处理线程"""
+        # 初始化处理线程
+        self.processor = create_processor()
+        self.processor.alarm_classes = self.get_selected_classes()
+        self.update_sound_enabled()
+        
+        # 采集在独立线程中进行, GUI线程只负责显示结果
+        self.capture = CaptureThread(self.processor)
+        if not self.capture.open():
+            self.capture = None
+            self.processor = None
             self.status_label.setText("状态: 无法打开摄像头")
             return
             
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.CAMERA_WIDTH)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, Config.CAMERA_HEIGHT)
-        
-        # 初始化处理线程
-        self.processor = VideoProcessor()
-        self.processor.alarm_classes = self.get_selected_classes()
         self.processor.start()
+        self.capture.start()
         
         self.is_camera_on = True
         self.timer.start(30)  # 约33FPS
@@ -151,36 +160,32 @@ class DetectionApp(QMainWindow):
     def stop_camera(self):
         """停止摄像头和处理线程"""
         self.timer.stop()
+        if self.capture:
+            self.capture.stop()
+            self.capture = None
+            
         if self.processor:
             self.processor.stop()
             self.processor = None
             
-        if self.cap:
-            self.cap.release()
-            self.cap = None
-            
         self.is_camera_on = False
         self.video_label.clear()
         
     def update_frame(self):
-        """更新视频帧和FPS"""
+        """显示处理结果并更新FPS"""
         if not self.is_camera_on:
             return
             
-        start_time = time.time()  # 记录处理开始时间
-        
-        ret, frame = self.cap.read()
-        if not ret:
+        if self.capture.failed:
             self.status_label.setText("状态: 无法读取摄像头帧")
             return
             
-        # 将帧送入处理队列
-        self.processor.put_frame(frame)
-        
         # 获取处理结果
         result = self.processor.get_result()
         if result is not None:
-            annotated_frame, alarms = result
+            annotated_frame, alarms, info = result
+            self.result_age = info['age']
+            self.frame_count += 1  # 按实际处理完成的帧计FPS, 而不是定时器触发次数
             
             # 转换为Qt图像格式
             rgb_image = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
@@ -193,31 +198,24 @@ class DetectionApp(QMainWindow):
                 self.video_label.height(),
                 Qt.KeepAspectRatio
             ))
+            self.processor.mark_displayed(info)
             
             # 更新状态
-            if alarms:
+            if len(alarms):
                 self.status_label.setText("状态: 检测到入侵!")
             else:
                 self.status_label.setText("状态: 摄像头运行中")
         
         # FPS计算
-        self.frame_count += 1
         current_time = time.time()
         time_diff = current_time - self.fps_update_time
         
         # 每0.5秒更新一次FPS显示
         if time_diff >= 0.5:
             self.fps = self.frame_count / time_diff
-            self.fps_label.setText(f"FPS: {self.fps:.1f}")
+            self.fps_label.setText(f"FPS: {self.fps:.1f}  延迟: {self.result_age * 1000:.0f}ms")
             self.frame_count = 0
             self.fps_update_time = current_time
-            
-        # 处理耗时计算
-        process_time = (time.time() - start_time) * 1000  # 毫秒
-        delay = max(1, int(1000 / Config.TARGET_FPS - process_time))
-        
-        # 确保不会过度延迟
-        delay = min(delay, 100)  # 最大延迟100ms
                 
     def get_selected_classes(self):
         """获取用户选择的检测类别"""
@@ -232,10 +230,19 @@ class DetectionApp(QMainWindow):
         if self.processor:
             self.processor.alarm_classes = self.get_selected_classes()
             
+    def start_profiling(self):
+        """开始限时采样分析, 结果写入save/profiles"""
+        if start_profiling(30) is not None:
+            self.status_label.setText("状态: 采样分析中(30秒)")
+            
+    def update_sound_enabled(self):
+        """报警声音开关"""
+        if self.processor and self.processor.audio is not None:
+            self.processor.audio.enabled = self.sound_check.isChecked()
+            
     def closeEvent(self, event):
         """窗口关闭时清理资源"""
         self.stop_camera()
-        pygame.mixer.quit()
         event.accept()
     def load_background(self, image_path):
         """后端方法：加载背景图片"""
@@ -415,12 +422,10 @@ if __name__ == '__main__':
     # 初始化PyQt应用
     app = QApplication(sys.argv)
     
-    # 检查PyGame音频初始化
-    pygame.mixer.init()
-    
     # 创建并显示主窗口
     window = DetectionApp()
     window.show()
+    install_signal_handler()  # kill -USR1 <pid> 开始采样分析
     
     # 运行应用
     sys.exit(app.exec_())
\ No newline at end of file